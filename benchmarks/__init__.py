@@ -0,0 +1,6 @@
+"""
+sthunder benchmarks.
+
+Timed scenarios of sthunder on synthetic GLM files (`benchmarks.synthetic`),
+run by `benchmarks.run`.
+"""
@@ -0,0 +1,85 @@
+"""
+Masked reductions benchmark.
+
+Compare the per-cell Python loops formerly used by the density maps with
+`sthunder.helpers.masked_reductions` on one synthetic month of hourly 0.5°
+data on a GLM-sized grid.
+
+    python benchmarks/bench_masked_reductions.py --hours 744
+"""
+
+import argparse
+import time as tm
+import numpy as np
+from sthunder.helpers.masked_reductions import index_mask, masked_reduce
+
+
+def loop_sum(gvars, lats_idx, lons_idx):
+    mat = np.zeros(gvars.shape[1:])
+    for lat_idx, lon_idx in zip(lats_idx, lons_idx):
+        mat[lat_idx][lon_idx] += gvars[:, lat_idx, lon_idx].sum()
+
+    return mat
+
+
+def loop_max(gvars):
+    maxv = 0
+    for ii in range(gvars.shape[1]):
+        for jj in range(gvars.shape[2]):
+            maxv = gvars[:, ii, jj].sum() if gvars[:, ii, jj].sum() > maxv \
+                else maxv
+
+    return maxv
+
+
+def timeit(func, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = tm.perf_counter()
+        result = func(*args)
+        best = min(best, tm.perf_counter() - start)
+
+    return best, result
+
+
+def main(hours=744, nlat=216, nlon=280, seed=42):
+    rng = np.random.default_rng(seed)
+    gvars = rng.poisson(0.05, (hours, nlat, nlon)).astype(np.float32)
+
+    # Disk-shaped "country" in the south-east quarter of the grid, roughly
+    # the footprint of Brazil in the GLM field of view.
+    ii, jj = np.mgrid[:nlat, :nlon]
+    inside = (((ii - nlat/3)/(nlat/5))**2 +
+              ((jj - 3*nlon/4)/(nlon/6))**2) < 1
+    lats_idx, lons_idx = np.nonzero(inside)
+    mask = index_mask((nlat, nlon), lats_idx, lons_idx)
+
+    print(f"grid {hours}x{nlat}x{nlon}, {mask.sum()} masked cells")
+
+    t_loop, ref = timeit(loop_sum, gvars, lats_idx, lons_idx, repeat=1)
+    t_vec, out = timeit(masked_reduce, gvars, mask, 'sum', 0)
+    assert np.allclose(ref, out)
+    print(f"masked sum: loop {t_loop:.3f}s, vectorized {t_vec:.4f}s, "
+          f"speedup {t_loop/t_vec:.0f}x")
+
+    t_loop, ref = timeit(loop_max, gvars, repeat=1)
+    t_vec, out = timeit(
+        lambda: masked_reduce(gvars, np.ones((nlat, nlon), bool)).max()
+    )
+    assert np.isclose(ref, out)
+    print(f"max cell total: loop {t_loop:.3f}s, vectorized {t_vec:.4f}s, "
+          f"speedup {t_loop/t_vec:.0f}x")
+
+    for how in ('max', 'mean', 'count'):
+        t_vec, _ = timeit(masked_reduce, gvars, mask, how)
+        print(f"masked {how}: {t_vec:.4f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=int, default=744)
+    parser.add_argument('--nlat', type=int, default=216)
+    parser.add_argument('--nlon', type=int, default=280)
+    args = parser.parse_args()
+
+    main(args.hours, args.nlat, args.nlon)
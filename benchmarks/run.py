@@ -0,0 +1,385 @@
+"""
+Benchmark runner.
+
+Time the ingestion, aggregation, SOM training and rendering scenarios of
+sthunder on synthetic GLM files at several scales, and save the results as
+JSON so runs of different versions can be compared.
+
+    python -m benchmarks.run --scales small medium --output results.json
+    python -m benchmarks.run --compare before.json after.json
+"""
+
+import os
+import sys
+import json
+import time as tm
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+from benchmarks import synthetic
+
+
+SCALES = {
+    'small': {'months': (1,), 'bbox': (-60., -20., -40., 0.),
+              'som': (5, 5), 'n_it': 200, 'cells': 100},
+    'medium': {'months': (1, 2, 3), 'bbox': (-74.5, -34.5, -28.5, 6.0),
+               'som': (10, 10), 'n_it': 500, 'cells': 1000},
+    'large': {'months': tuple(range(1, 13)), 'bbox': synthetic.BBOX_GLM,
+              'som': (13, 13), 'n_it': 500, 'cells': 5570},
+}
+
+
+class Skip(Exception):
+    pass
+
+
+def measure(func, repeat=3):
+    """
+    measure(func, repeat=3)
+
+    Call `func` `repeat` times and return the best and mean wall times and
+    the last result.
+    """
+    times, result = [], None
+    for _ in range(repeat):
+        start = tm.perf_counter()
+        result = func()
+        times.append(tm.perf_counter() - start)
+
+    return min(times), float(np.mean(times)), result
+
+
+def som_input(files, cells, seed=42):
+    """
+    som_input(files, cells, seed=42)
+
+    Return the min-max scaled hourly series of `cells` random active cells
+    of the first file, one row per cell, as case_study_01 builds per city.
+    """
+    from sthunder import glm
+
+    nc = glm.open_glm(files[0])
+    var = np.nan_to_num(nc['var'].values)
+    nc.close()
+
+    flat = var.reshape(len(var), -1)
+    active = np.flatnonzero(flat.sum(axis=0) > 0)
+    rng = np.random.default_rng(seed)
+    series = flat[:, rng.choice(active, min(cells, len(active)),
+                                replace=False)].T
+
+    vmin, vmax = series.min(axis=0), series.max(axis=0)
+    return (series - vmin) / np.where(vmax > vmin, vmax - vmin, 1)
+
+
+def bench_job_flash(ctx):
+    if 'USER_POSTGRES' not in os.environ:
+        raise Skip("no database configured (USER_POSTGRES is not set)")
+
+    from sthunder import database
+
+    best, mean, _ = measure(lambda: database.job_flash(ctx['files'][0]),
+                            repeat=1)
+    return {'job_flash': (best, mean)}
+
+
+def bench_density(ctx):
+    from sthunder import glm, helpers
+
+    files = ctx['files']
+    results = {}
+    best, mean, cube = measure(lambda: glm.build_daily_cube(files), repeat=1)
+    results['build_daily_cube'] = (best, mean)
+
+    mlon, mlat = np.meshgrid(cube.lons, cube.lats)
+    mask = (np.hypot(mlon - mlon.mean(), mlat - mlat.mean()) <
+            0.4*(cube.lons.max() - cube.lons.min()))
+    year = int(str(cube.days[0])[:4])
+
+    best, mean, _ = measure(lambda: cube.annual(year, mask))
+    results['annual'] = (best, mean)
+    best, mean, _ = measure(lambda: [cube.monthly(year, month, mask)
+                                     for month in range(1, 13)])
+    results['monthly'] = (best, mean)
+    best, mean, _ = measure(lambda: [cube.seasonal(year, season, mask)
+                                     for season in range(1, 5)])
+    results['seasonal'] = (best, mean)
+
+    nc = glm.open_glm(files[0])
+    hourly = np.nan_to_num(nc['var'].values)
+    nc.close()
+    best, mean, _ = measure(lambda: helpers.masked_reduce(hourly, mask))
+    results['masked_sum_month'] = (best, mean)
+
+    best, mean, pyramid = measure(lambda: glm.build_pyramid(cube), repeat=1)
+    results['build_pyramid'] = (best, mean)
+    best, mean, _ = measure(lambda: pyramid.annual(year, resolution=2))
+    results['annual_2deg'] = (best, mean)
+
+    ctx['cube'] = cube
+    return results
+
+
+def bench_som(ctx):
+    from sthunder import som
+
+    nrow, ncol = ctx['scale']['som']
+    data = som_input(ctx['files'], ctx['scale']['cells'])
+    ctx['data'] = data
+
+    results = {}
+    for method in ('random', 'batch'):
+        best, mean, SOM = measure(lambda: som.create_and_fitting_minisom(
+            data, nrow, ncol, training_method=method,
+            n_it=ctx['scale']['n_it'], sigma=3, nf='triangle'
+        ), repeat=1)
+        results[f"create_and_fitting_minisom_{method}"] = (best, mean)
+
+    best, mean, _ = measure(lambda: som.create_and_fitting_batch_som(
+        data, nrow, ncol, sigma=3, nf='triangle'
+    ), repeat=1)
+    results['create_and_fitting_batch_som'] = (best, mean)
+
+    best, mean, _ = measure(lambda: som.get_color_and_alpha_maps(SOM, data))
+    results['get_color_and_alpha_maps'] = (best, mean)
+
+    ctx['som'] = SOM
+    return results
+
+
+def bench_plots(ctx):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from sthunder import constants as const
+    from sthunder import som, visualization as viz
+
+    if 'som' not in ctx:
+        bench_som(ctx)
+
+    # Figures are written to the run directory instead of the results one.
+    const.DIR_IMG_CITIES = os.path.join(ctx['workdir'], 'img')
+    os.makedirs(os.path.join(const.DIR_IMG_CITIES, 'weights'), exist_ok=True)
+
+    SOM, data = ctx['som'], ctx['data']
+    color_map, alpha_map = som.get_color_and_alpha_maps(SOM, data)
+
+    results = {}
+    best, mean, _ = measure(lambda: (viz.plot_weights(SOM, data, 0),
+                                     plt.close('all')))
+    results['plot_weights'] = (best, mean)
+    best, mean, _ = measure(lambda: (viz.plot_neurons_map(color_map,
+                                                          alpha_map),
+                                     plt.close('all')))
+    results['plot_neurons_map'] = (best, mean)
+
+    if 'cube' in ctx:
+        cube = ctx['cube']
+        mat = np.asarray(cube.totals.sum(axis=0))
+
+        def density_map():
+            fig, ax = plt.subplots(figsize=(10, 10))
+            ax.contourf(cube.lons, cube.lats, np.where(mat > 0, mat, np.nan),
+                        cmap='Spectral_r', levels=20)
+            fig.savefig(os.path.join(const.DIR_IMG_CITIES, 'density.png'))
+            plt.close(fig)
+
+        best, mean, _ = measure(density_map)
+        results['density_map'] = (best, mean)
+
+    return results
+
+
+SCENARIOS = {
+    'job_flash': bench_job_flash,
+    'density': bench_density,
+    'som': bench_som,
+    'plots': bench_plots,
+}
+
+
+def environment():
+    """
+    environment()
+
+    Return the metadata of the run: version control revision, Python and
+    library versions and machine.
+    """
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        revision = None
+
+    versions = {}
+    for name in ('numpy', 'xarray', 'minisom', 'matplotlib'):
+        try:
+            versions[name] = getattr(__import__(name), '__version__', None)
+        except ImportError:
+            versions[name] = None
+
+    return {'revision': revision, 'python': sys.version.split()[0],
+            'versions': versions, 'machine': platform.machine(),
+            'system': platform.system(), 'cpus': os.cpu_count(),
+            'timestamp': tm.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run(scales=('small',), scenarios=tuple(SCENARIOS), data_dir=None):
+    """
+    run(scales=('small',), scenarios=tuple(SCENARIOS), data_dir=None)
+
+    Run the scenarios at each scale.
+
+    Parameters
+    ----------
+    scales : tuple, optional
+        Keys of `SCALES`. The default is ('small',).
+    scenarios : tuple, optional
+        Keys of `SCENARIOS`. The default is every scenario.
+    data_dir : str, optional
+        Directory of the synthetic files, reused across runs. The default
+        is None, a temporary directory.
+
+    Returns
+    -------
+    dict
+        'environment' metadata and 'results', one record per timing with
+        the keys 'scale', 'scenario', 'name', 'best', 'mean' and 'status'.
+
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix='sthunder-bench-')
+    records = []
+    for scale in scales:
+        params = SCALES[scale]
+        directory = os.path.join(data_dir, scale)
+        files = synthetic.write_glm_files(directory, months=params['months'],
+                                          bbox=params['bbox'])
+        ctx = {'scale': params, 'files': files,
+               'workdir': tempfile.mkdtemp(prefix='sthunder-bench-run-')}
+
+        for scenario in scenarios:
+            print(f"{scale}/{scenario}")
+            try:
+                timings = SCENARIOS[scenario](ctx)
+            except Skip as error:
+                records.append({'scale': scale, 'scenario': scenario,
+                                'status': 'skipped', 'message': str(error)})
+                continue
+            except Exception as error:
+                records.append({'scale': scale, 'scenario': scenario,
+                                'status': 'failed',
+                                'message': f"{type(error).__name__}: {error}"})
+                continue
+
+            for name, (best, mean) in timings.items():
+                print(f"    {name}: {best:.4f}s")
+                records.append({'scale': scale, 'scenario': scenario,
+                                'name': name, 'best': best, 'mean': mean,
+                                'status': 'ok'})
+
+    return {'environment': environment(), 'results': records}
+
+
+def compare(before, after):
+    """
+    compare(before, after)
+
+    Print the ratio of the best times of two result files, per scale and
+    timing. Ratios above 1 are regressions. Timings missing from either
+    file, e.g. of a scenario that failed or was skipped, are listed after
+    the ratios with the status of their scenario.
+
+    Returns
+    -------
+    list
+        (scale, name, before status, after status) of the timings missing
+        from `after`, or of the scenarios that failed in it.
+
+    """
+    def load(path):
+        with open(path) as file:
+            records = json.load(file)['results']
+        timings = {(r['scale'], r['name']): r for r in records
+                   if r['status'] == 'ok'}
+        scenarios = {(r['scale'], r['scenario']): r for r in records
+                     if r['status'] != 'ok'}
+        return timings, scenarios
+
+    old, old_scenarios = load(before)
+    new, new_scenarios = load(after)
+    scenario_of = {key: r['scenario'] for timings in (old, new)
+                   for key, r in timings.items()}
+
+    def status(timings, scenarios, key):
+        if key in timings:
+            return 'ok'
+        record = scenarios.get((key[0], scenario_of[key]))
+        if record is None:
+            return 'missing'
+        return f"{record['status']}: {record.get('message', '')}"
+
+    for key in sorted(old.keys() & new.keys()):
+        t_old, t_new = old[key]['best'], new[key]['best']
+        ratio = t_new/t_old if t_old else np.inf
+        print(f"{key[0]:>6} {key[1]:<40} {t_old:10.4f}s "
+              f"{t_new:10.4f}s {ratio:6.2f}x")
+
+    problems = []
+    for key in sorted(old.keys() ^ new.keys()):
+        problem = (key[0], key[1], status(old, old_scenarios, key),
+                   status(new, new_scenarios, key))
+        print(f"{key[0]:>6} {key[1]:<40} before {problem[2]}, "
+              f"after {problem[3]}")
+        if problem[3] != 'ok':
+            problems.append(problem)
+
+    # Scenarios failing in `after` without any timing in either file.
+    reported = {(key[0], scenario_of[key]) for key in old.keys() | new.keys()}
+    for key, record in sorted(new_scenarios.items()):
+        if record['status'] == 'failed' and key not in reported:
+            previous = old_scenarios.get(key, {'status': 'missing'})
+            problem = (key[0], key[1], previous['status'],
+                       f"failed: {record.get('message', '')}")
+            print(f"{key[0]:>6} {key[1]:<40} before {problem[2]}, "
+                  f"after {problem[3]}")
+            problems.append(problem)
+
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', nargs='+', default=['small'],
+                        choices=list(SCALES))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS),
+                        choices=list(SCENARIOS))
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        if compare(*args.compare):
+            sys.exit(1)
+    else:
+        report = run(args.scales, args.scenarios, args.data_dir)
+        revision = report['environment']['revision']
+        output = args.output or os.path.join(
+            'benchmarks', 'results',
+            f"{tm.strftime('%Y%m%dT%H%M%S')}_{revision}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=1)
+        print(f"results saved to {output}")
+
+        failed = [r for r in report['results'] if r['status'] == 'failed']
+        for record in failed:
+            print(f"{record['scale']}/{record['scenario']} failed: "
+                  f"{record['message']}")
+        if failed:
+            sys.exit(1)
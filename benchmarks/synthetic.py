@@ -0,0 +1,152 @@
+"""
+Synthetic GLM files.
+
+Generate `GLM_YYYY_MM_hourly_05x05.nc` files with the layout of the
+`G05GT1H` files (`var` with dims time, lat, lon) and a realistic sparsity:
+flashes are clustered in a few convective regions, follow a diurnal cycle
+peaking in the afternoon, and most cell-hours are 0.
+
+    python -m benchmarks.synthetic /tmp/glm --months 1 2 3
+"""
+
+import os
+import argparse
+import numpy as np
+import xarray as xr
+
+
+# GOES-16 GLM field of view (lon_min, lat_min, lon_max, lat_max).
+BBOX_GLM = (-135., -55., -15., 55.)
+
+
+def grid_axes(bbox=BBOX_GLM, resolution=0.5):
+    """
+    grid_axes(bbox=BBOX_GLM, resolution=0.5)
+
+    Return the lon and lat cell centers of a regular grid over `bbox`.
+    """
+    lon_min, lat_min, lon_max, lat_max = bbox
+    lons = np.arange(lon_min + resolution/2, lon_max, resolution)
+    lats = np.arange(lat_min + resolution/2, lat_max, resolution)
+
+    return lons, lats
+
+
+def climatology(lons, lats, rng, nregions=12, width=6.):
+    """
+    climatology(lons, lats, rng, nregions=12, width=6.)
+
+    Return a (nlat, nlon) field in [0, 1] of the relative flash activity,
+    made of Gaussian convective regions concentrated in the tropics.
+    """
+    mlon, mlat = np.meshgrid(lons, lats)
+    field = np.zeros(mlon.shape)
+    centers_lon = rng.uniform(lons.min(), lons.max(), nregions)
+    centers_lat = np.clip(rng.normal(-5, 15, nregions), lats.min(),
+                          lats.max())
+    for clon, clat in zip(centers_lon, centers_lat):
+        field += np.exp(-((mlon - clon)**2 + (mlat - clat)**2) /
+                        (2*width**2))
+
+    return field/field.max()
+
+
+def monthly_times(year, month):
+    start = np.datetime64(f"{year}-{str(month).zfill(2)}", 'M')
+
+    return np.arange(start.astype('datetime64[h]'),
+                     (start + 1).astype('datetime64[h]')).astype(
+                         'datetime64[ns]')
+
+
+def make_glm_dataset(year, month, lons, lats, clim, rng, active=0.03):
+    """
+    make_glm_dataset(year, month, lons, lats, clim, rng, active=0.03)
+
+    Generate the hourly flash totals of a month.
+
+    Parameters
+    ----------
+    year : int
+        Year.
+    month : int
+        Month.
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    clim : numpy.ndarray
+        Relative activity of each cell, shape (nlat, nlon).
+    rng : numpy.random.Generator
+        Random generator.
+    active : float, optional
+        Mean fraction of active cell-hours. The default is 0.03.
+
+    Returns
+    -------
+    xarray.Dataset
+        Dataset with the float32 variable `var`.
+
+    """
+    times = monthly_times(year, month)
+    hours = times.astype('datetime64[h]').astype(np.int64) % 24
+
+    # Diurnal cycle peaking around 20 UTC (afternoon over South America).
+    diurnal = 1 + 0.8*np.cos(2*np.pi*(hours - 20)/24)
+    prob = (active/clim.mean()) * clim[None] * diurnal[:, None, None] / 1.8
+    prob = np.clip(prob, 0, 1)
+
+    on = rng.random(prob.shape, dtype=np.float32) < prob
+    var = np.zeros(prob.shape, dtype=np.float32)
+    var[on] = np.ceil(rng.lognormal(2., 1.2, on.sum()))
+
+    return xr.Dataset({'var': (('time', 'lat', 'lon'), var)},
+                      coords={'time': times, 'lat': lats, 'lon': lons})
+
+
+def write_glm_files(directory, year=2020, months=range(1, 13),
+                    bbox=BBOX_GLM, resolution=0.5, seed=42, active=0.03):
+    """
+    write_glm_files(directory, year=2020, months=range(1, 13),
+                    bbox=BBOX_GLM, resolution=0.5, seed=42, active=0.03)
+
+    Write one synthetic GLM file per month in `directory`, skipping the
+    files already there.
+
+    Returns
+    -------
+    list
+        Paths of the files.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    lons, lats = grid_axes(bbox, resolution)
+    clim = climatology(lons, lats, rng)
+
+    filenames = []
+    for month in months:
+        filename = os.path.join(
+            directory, f"GLM_{year}_{str(month).zfill(2)}_hourly_05x05.nc"
+        )
+        if not os.path.exists(filename):
+            make_glm_dataset(year, month, lons, lats, clim, rng,
+                             active).to_netcdf(filename)
+        filenames.append(filename)
+
+    return filenames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory')
+    parser.add_argument('--year', type=int, default=2020)
+    parser.add_argument('--months', type=int, nargs='+',
+                        default=list(range(1, 13)))
+    parser.add_argument('--bbox', type=float, nargs=4, default=BBOX_GLM)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for filename in write_glm_files(args.directory, args.year, args.months,
+                                    tuple(args.bbox), seed=args.seed):
+        print(filename)
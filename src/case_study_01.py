@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
+from matplotlib.colors import to_rgba_array
 import numpy as np
-from dask import dataframe as dd
-from minisom import MiniSom
-from sklearn.preprocessing import MinMaxScaler
 import SimpSOM as sps
 import geopandas as gpd
 from sthunder import constants as const
+from sthunder import glm
+from sthunder import helpers
+from sthunder.som import get_color_and_alpha_maps, get_fitted_som
 
 
 
@@ -24,34 +25,18 @@ def plot_weights(som, data):
 def plot_neurons(som, data):
     weights = som.get_weights()
     
-    Z = np.full((*som._weights.shape[:-1],), '')
     thr = 0.05
     plt.figure(figsize=(10, 10))
-    color = np.full((*som._weights.shape[:-1],), 'white')
-    alpha = np.full((*som._weights.shape[:-1],), 0.)
+    color, alpha = get_color_and_alpha_maps(som, data, thr, thr, 
+                                            normalize_alpha=False)
     
-    for i in np.arange(weights.shape[0]):
-        for j in np.arange(weights.shape[1]):
-            # argmax= np.argmax(weights[i, j, :])
-            w = weights[i, j, :]
-            act = len(w[w>thr])
-            ina = len(w[w<=thr])
-            
-            # print(act, ina)
-            if act/(act+ina) >= thr:
-                # Z[i][j] = 'red'
-                color[i][j] = 'red'
-                alpha[i][j] = act/(act+ina)
-                plt.plot([j+.5], [i+.5], 'o', color="red",
-                          marker='o', markersize=33, alpha=act/(act+ina))
-            else:
-                # Z[i][j] = 'blue'
-                color[i][j] = 'blue'
-                alpha[i][j] = act/(act+ina)
-                plt.plot([j+.5], [i+.5], 'o', color="blue",
-                          marker='o', markersize=33, alpha=ina/(act+ina))
+    # Active neurons are drawn with their activity fraction as alpha, 
+    # inactive ones with their inactivity fraction.
+    rgba = to_rgba_array(color.ravel())
+    rgba[:, 3] = np.where(color == 'red', alpha, 1 - alpha).ravel()
+    ii, jj = np.indices(color.shape)
+    plt.scatter(jj.ravel()+.5, ii.ravel()+.5, s=33**2, c=rgba, marker='o')
     
-    # plt.imshow(Z)
     plt.xlim([0, weights.shape[0]])
     plt.ylim([0, weights.shape[1]])
     
@@ -59,19 +44,14 @@ def plot_neurons(som, data):
 
 
 def plot_single_density_city_map(df, color, alpha):
-    ngdf = gpd.read_file(
-        const.SHP_BRAZIL_CITIES
+    ngdf = helpers.read_layer(
+        const.SHP_BRAZIL_CITIES, tolerance=0.01
     ).set_index('nome').loc[df.columns][['geometry']]
     
-    c, a = [], []
-    for i, (city, row) in enumerate(ngdf.iterrows()):
-        winner = som.winner(norm.transform(df[[city]].values.T)[0])
+    city_winners = winners[df.columns.get_indexer(ngdf.index)]
         
-        c.append(color[winner[0]][winner[1]])
-        a.append(alpha[winner[0]][winner[1]])
-        
-    ngdf['color'] = c
-    ngdf['alpha'] = a
+    ngdf['color'] = color[city_winners[:, 0], city_winners[:, 1]]
+    ngdf['alpha'] = alpha[city_winners[:, 0], city_winners[:, 1]]
         
     
     
@@ -90,22 +70,7 @@ def plot_single_density_city_map(df, color, alpha):
     
 
 
-df = dd.read_csv(
-    "/glm/city_state.csv"
-).groupby(
-    ['city', 'datetime']
-).aggregate(
-    {'total': 'sum'}
-).reset_index().compute().pivot(
-     columns='city', index='datetime', values='total'
-).reset_index()
-    
-
-df['datetime'] = dd.to_datetime(df['datetime'])
-df = df.set_index('datetime')
-
-norm = MinMaxScaler(feature_range=(0, 1))
-data = norm.fit_transform(df.values.T)
+df = glm.get_series_store(shapefile=const.SHP_BRAZIL_CITIES, column='nome')
 
 nr, nc = 13, 13
 sigma = 3
@@ -114,15 +79,12 @@ neigh_func = 'triangle'
 topology = 'rectangular'
 
 
-som = MiniSom(
-    x=nr, y=nc, input_len=data.shape[1], sigma=sigma, 
-    learning_rate=lr, neighborhood_function=neigh_func,
-    topology=topology,
-    random_seed=42
+# Loaded from the cache when the data and parameters did not change.
+som, norm, winners = get_fitted_som(
+    df.values.T, nr, nc, feature_range=(0, 1), n_it=500, sigma=sigma, lr=lr,
+    nf=neigh_func, topology=topology, random_seed=42
 )
-
-som.random_weights_init(data)
-som.train_random(data=data, num_iteration=500)
+data = norm.transform(df.values.T)
 
 
 color, alpha = plot_neurons(som, data)
@@ -7,42 +7,36 @@ import shapely.geometry as sgeom
 from descartes import PolygonPatch
 import matplotlib as mpl
 from sthunder import constants as const
+from sthunder import helpers
+from sthunder import glm
 
 
 def load_NCFile(filename):
-    nc = xr.load_dataset(filename)
-    lon = nc['lon'].data
-    lat = nc['lat'].data
-    tim = nc['time'].data
-    var = nc['var'].data
+    with glm.open_glm(filename) as nc:
+        lon = nc['lon'].data
+        lat = nc['lat'].data
+        tim = nc['time'].data
+        var = nc['var'].load()
     
     return lon, lat, tim, var
 
 
 def filter_coords_country(glons, glats, country_name):
-    gdf = gpd.read_file(const.SHP_SOUTH_AMERICA, crs=const.EPSG4326)
-    country_geom = gdf[gdf['COUNTRY'] == country_name].iloc[0, -1]
+    country_geom = helpers.get_geometry(const.SHP_SOUTH_AMERICA, 'COUNTRY',
+                                        country_name)
     
-    clons, clats, lats_idx, lons_idx = [], [], [], []
-    
-    for i, lat in enumerate(glats):
-        for j, lon in enumerate(glons):
-            if country_geom.contains(sgeom.Point(lon, lat)):
-                clats.append(lat)
-                clons.append(lon)
-                lats_idx.append(i)
-                lons_idx.append(j)
-
-    clats = np.array(clats)                
-    clons = np.array(clons)
+    mask = helpers.get_grid_mask(glons, glats, const.SHP_SOUTH_AMERICA,
+                                 'COUNTRY', country_name, geom=country_geom)
+    lats_idx, lons_idx = np.nonzero(mask)
 
-    lats_idx = np.array(lats_idx)    
-    lons_idx = np.array(lons_idx)
+    clats = glats[lats_idx]
+    clons = glons[lons_idx]
     
     return country_geom, clons, clats, lons_idx, lats_idx
 
 
-def plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
+def plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx,
+                              cube=None, resolution=0.5, filenames=None):
     dpi = 100
     width = np.round(1366 * 100 / 100)
     height = 768*2
@@ -57,25 +51,18 @@ def plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
     fig, ax = plt.subplots(1, 1, figsize=(width/dpi, height/dpi), 
                            facecolor='w', sharex=True, sharey=True)
     
-    mat = np.zeros((glats.shape[0], glons.shape[0]))
-    
-    path = "/glm/G05GT1H/"
-    files = sorted([os.path.join(path, file) for file in os.listdir(path)])
-    for i, file in enumerate(files):       
-        gvars = xr.load_dataset(file)['var'].data
-        
-        for lat_idx, lon_idx in zip(lats_idx, lons_idx):
-            mat[lat_idx][lon_idx] += gvars[:, lat_idx, lon_idx].sum()
+    mask = helpers.index_mask((glats.shape[0], glons.shape[0]), lats_idx, 
+                              lons_idx)
+    cube = cube or glm.get_pyramid(filenames).level(resolution)
+    # Totals per 0.5° cell, so the levels below hold at every resolution.
+    scale = glm.base_cells(cube)
+    mat = cube.annual(2020, mask) / scale
     
-        mlon, mlat = np.meshgrid(glons[lons_idx.min(): lons_idx.max()], 
-                                 glats[lats_idx.min(): lats_idx.max()])
-        mat[mat == 0] = np.nan
+    mlon, mlat = np.meshgrid(glons[lons_idx.min(): lons_idx.max()], 
+                             glats[lats_idx.min(): lats_idx.max()])
+    mat[mat == 0] = np.nan
         
-    maxv = 0
-    for ii in range(gvars.shape[1]):
-        for jj in range(gvars.shape[2]):
-            maxv = mat[ii, jj].sum() if mat[ii, jj].sum() > maxv else maxv
-    print(file, maxv)
+    print(2020, np.nanmax(mat))
     
     ax.set_title(f"ACUMULADO ANUAL DE FLASHES EM 2020", 
                  fontdict={'size': 16, 'weight': 'bold'})
@@ -101,12 +88,15 @@ def plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
         labelpad=-55, fontdict={'size': 14, 'weight': '500'},
     )
     
-    plt.savefig(f"{const.DIR_RESULTS}/spatial_density_analysis/" \
-                "density_map_anual.png", 
-                    transparent=False, bbox_inches='tight', pad_inches=0.1)
+    filename = f"{const.DIR_RESULTS}/spatial_density_analysis/" \
+               "density_map_anual.png"
+    plt.savefig(filename, transparent=False, bbox_inches='tight', 
+                pad_inches=0.1)
+    glm.register_output(filename, ['annual/2020'])
         
         
-def plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
+def plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx,
+                               cube=None, resolution=0.5, filenames=None):
     dpi = 100
     width = np.round(1366 * 125 / 100)
     height = 768*2.3
@@ -122,23 +112,17 @@ def plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
     fig.suptitle("ACUMULADO MENSAL DE FLASHES EM 2020", size=18, 
                  weight='bold', y=0.92)
     
-    path = "/glm/G05GT1H/"
-    files = sorted([os.path.join(path, file) for file in os.listdir(path)])
-    for i, file in enumerate(files):    
+    mask = helpers.index_mask((glats.shape[0], glons.shape[0]), lats_idx, 
+                              lons_idx)
+    cube = cube or glm.get_pyramid(filenames).level(resolution)
+    # Totals per 0.5° cell, so the levels below hold at every resolution.
+    scale = glm.base_cells(cube)
+    for i, month in enumerate(range(1, 13)):    
         row = i//4
         col = i%4
         
-        mat = np.zeros((glats.shape[0], glons.shape[0]))
-        gvars = xr.load_dataset(file)['var'].data
-        
-        maxv = 0
-        for ii in range(gvars.shape[1]):
-            for jj in range(gvars.shape[2]):
-                maxv = gvars[:, ii, jj].sum() if gvars[:, ii, jj].sum() > maxv else maxv
-        print(file, maxv)
-        
-        for lat_idx, lon_idx in zip(lats_idx, lons_idx):
-            mat[lat_idx][lon_idx] += gvars[:, lat_idx, lon_idx].sum()
+        mat = cube.monthly(2020, month, mask) / scale
+        print(month, mat.max())
     
         mlon, mlat = np.meshgrid(glons[lons_idx.min(): lons_idx.max()], 
                                  glats[lats_idx.min(): lats_idx.max()])
@@ -173,44 +157,25 @@ def plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx):
         labelpad=-55, fontdict={'size': 14, 'weight': '500'},
     )
     
-    plt.savefig(f"{const.DIR_RESULTS}/spatial_density_analysis/" \
-                "density_map_month.png", 
-                    transparent=False, bbox_inches='tight', pad_inches=0.1)
+    filename = f"{const.DIR_RESULTS}/spatial_density_analysis/" \
+               "density_map_month.png"
+    plt.savefig(filename, transparent=False, bbox_inches='tight', 
+                pad_inches=0.1)
+    # One figure shows every month of the year.
+    glm.register_output(filename, [f"monthly/2020-{str(month).zfill(2)}"
+                                   for month in range(1, 13)])
 
 
 def plot_seasonal_flash_density(country_geom, glats, glons, lats_idx, 
-                                lons_idx):
-    def get_station_flashes(station_keys):
-        mat = np.zeros((glats.shape[0], glons.shape[0]))
-        for month, days in station_keys.items():
-            filename = f"/glm/G05GT1H/GLM_2020_{str(month).zfill(2)}_hourly_05x05.nc"
-            gvars = xr.load_dataset(
-                filename
-            )['var'].data[days[0]*24:days[1]*24+1, :, :]
-
-            maxv = 0
-            for ii in range(gvars.shape[1]):
-                for jj in range(gvars.shape[2]):
-                    maxv = gvars[:, ii, jj].sum() if gvars[:, ii, jj].sum() > maxv else maxv
-
-            for lat_idx, lon_idx in zip(lats_idx, lons_idx):
-                mat[lat_idx][lon_idx] += gvars[:, lat_idx, lon_idx].sum()
-        
-        return mat
-    
-    
-    autumn_keys = {3: (20, 31), 4: (0, 30), 5: (0, 31), 6: (0, 20)}
-    winter_keys = {6: (20, 30), 7: (0, 31), 8: (0, 31), 9: (0, 22)}
-    spring_keys = {9: (22, 30), 10: (0, 31), 11: (0, 30), 12: (0, 21)}
-    summer_keys = {12: (21, 31), 1: (0, 31), 2: (0, 29), 3: (0, 20)}
-    
-    autumn = np.zeros((glats.shape[0], glons.shape[0]))
-    winter = np.zeros((glats.shape[0], glons.shape[0]))
-    spring = np.zeros((glats.shape[0], glons.shape[0]))
-    summer = np.zeros((glats.shape[0], glons.shape[0]))
-    
-    station_keys = [autumn_keys, winter_keys, spring_keys, summer_keys]
-    stations = [get_station_flashes(sk) for sk in station_keys]
+                                lons_idx, cube=None, resolution=0.5,
+                                filenames=None):
+    mask = helpers.index_mask((glats.shape[0], glons.shape[0]), lats_idx, 
+                              lons_idx)
+    cube = cube or glm.get_pyramid(filenames).level(resolution)
+    # Totals per 0.5° cell, so the levels below hold at every resolution.
+    scale = glm.base_cells(cube)
+    stations = [cube.seasonal(2020, season, mask) / scale
+                for season in const.SEASONAL_WINDOWS]
     
     mlon, mlat = np.meshgrid(glons[lons_idx.min(): lons_idx.max()], 
                              glats[lats_idx.min(): lats_idx.max()])
@@ -266,21 +231,38 @@ def plot_seasonal_flash_density(country_geom, glats, glons, lats_idx,
     )
     
     
-    plt.savefig(f"{const.DIR_RESULTS}/spatial_density_analysis/" \
-                "density_map_seasonal.png", 
-                    transparent=False, bbox_inches='tight', pad_inches=0.1)
+    filename = f"{const.DIR_RESULTS}/spatial_density_analysis/" \
+               "density_map_seasonal.png"
+    plt.savefig(filename, transparent=False, bbox_inches='tight', 
+                pad_inches=0.1)
+    glm.register_output(filename, [f"seasonal/2020-{season}"
+                                   for season in const.SEASONAL_WINDOWS])
 
     
 
 
-if __name__ == "__main__":
-    nc_file = '/glm/G05GT1H/GLM_2020_01_hourly_05x05.nc'
-    glons, glats, gtimes, gvars = load_NCFile(nc_file)
+def plot_flash_density_maps(resolution=0.5, country_name='Brazil',
+                            filenames=None):
+    """
+    Draw the density maps of the GLM `filenames`, every file by default,
+    from the coarsest pyramid level meeting `resolution`, in degrees, e.g. 2
+    for a continental overview.
+    """
+    glm.update_aggregates(filenames, series=())
+    cube = glm.get_pyramid(filenames).level(resolution)
+    glons, glats = cube.lons, cube.lats
     
     country_geom, clons, clats, lons_idx, lats_idx = filter_coords_country(
-            glons, glats, 'Brazil'
+            glons, glats, country_name
     )
     
-    # plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx)
-    # plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx)
-    plot_seasonal_flash_density(country_geom, glats, glons, lats_idx, lons_idx)
\ No newline at end of file
+    # plot_annual_flash_density(country_geom, glats, glons, lats_idx, lons_idx,
+    #                           cube)
+    # plot_monthly_flash_density(country_geom, glats, glons, lats_idx, lons_idx,
+    #                            cube)
+    plot_seasonal_flash_density(country_geom, glats, glons, lats_idx, lons_idx,
+                                cube)
+
+
+if __name__ == "__main__":
+    plot_flash_density_maps(resolution=0.5)
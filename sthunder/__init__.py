@@ -1,5 +1,6 @@
 __version__ = '0.1.0'
 from . import database
+from . import glm
 from . import helpers
 from . import som
 from . import visualization
@@ -8,12 +8,17 @@ SHP_BRAZIL_CITIES = "/home/adriano/CAP-395/data/GEO/Vector/BrazilCitiesPolygon/m
 # Input directories
 DIR_GLM_FILES = "/glm/G05GT1H"
 DIR_RESULTS = "/home/adriano/sthunder/results"
+DIR_CACHE = "/home/adriano/sthunder/cache"
 
 
 # Output directories
 DIR_IMG_CITIES = "/home/adriano/sthunder/results/city"
 
 
+# Bounding boxes (lon_min, lat_min, lon_max, lat_max)
+BBOX_BRAZIL = (-74.5, -34.5, -28.5, 6.0)
+
+
 # Styles
 STYLE_TITLE = {'size': 16, 'weight': 'bold'}
 
@@ -41,5 +46,9 @@ SEASONAL_LABELS_BR = {1: 'Autumn', 2: 'Winter', 3: 'Spring', 4: 'Summer'}
 SEASONAL_LABELS_BR = {1: 'Outono', 2: 'Inverno', 3: 'Primavera', 4: 'Verão'}
 SEASONAL_LABELS = SEASONAL_LABELS_BR
 
+# Seasons as ((first month, first day), (end month, end day)), end excluded
+SEASONAL_WINDOWS = {1: ((3, 21), (6, 21)), 2: ((6, 21), (9, 23)),
+                    3: ((9, 23), (12, 22)), 4: ((12, 22), (3, 21))}
+
 
 
@@ -0,0 +1,111 @@
+"""
+Database connection (:mod: `sthunder.database.Database`)
+
+This module provides the connection objects used by the query and populate
+modules.
+"""
+
+import os
+from functools import wraps
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+DB_PORT = os.environ.get('PORT_POSTGRES', '5432')
+DB_HOST = os.environ.get('HOST_POSTGRES', '127.0.0.1')
+DB_NAME = os.environ.get('NAME_POSTGRES', 'sthunder')
+
+_ENGINES = {}
+
+
+def get_db_uri():
+    """
+    get_db_uri()
+
+    Build the PostgreSQL URI from the `USER_POSTGRES` and `PASS_POSTGRES`
+    environment variables.
+
+    Returns
+    -------
+    str
+        The database URI.
+
+    """
+    user = os.environ['USER_POSTGRES']
+    password = os.environ['PASS_POSTGRES']
+
+    return f'postgresql://{user}:{password}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+
+def get_engine(uri=None, echo=False):
+    """
+    get_engine(uri=None, echo=False)
+
+    Return the pooled engine for `uri`, creating it on first use so every
+    session of the process shares the same connection pool.
+
+    Parameters
+    ----------
+    uri : str, optional
+        Database URI. The default is the URI from `get_db_uri`.
+    echo : bool, optional
+        If SQL statements must be logged. The default is False.
+
+    Returns
+    -------
+    sqlalchemy.engine.Engine
+        The database engine.
+
+    """
+    uri = uri or get_db_uri()
+    if uri not in _ENGINES:
+        _ENGINES[uri] = create_engine(uri, echo=echo)
+
+    return _ENGINES[uri]
+
+
+class Database:
+    """
+    Database(uri=None, echo=False)
+
+    Hold an engine and an open session.
+
+    Parameters
+    ----------
+    uri : str, optional
+        Database URI. The default is the URI from `get_db_uri`.
+    echo : bool, optional
+        If SQL statements must be logged. The default is False.
+
+    """
+
+    def __init__(self, uri=None, echo=False):
+        self.engine = get_engine(uri, echo)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def raw_connection(self):
+        """
+        Return a DBAPI connection checked out from the engine pool.
+        """
+        return self.engine.raw_connection()
+
+    def close(self):
+        self.session.close()
+
+
+def db_connection(func):
+    """
+    db_connection(func)
+
+    Decorator that opens a `Database` session, passes it as the first
+    argument of `func` and closes it afterwards.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        db = Database()
+        try:
+            return func(db.session, *args, **kwargs)
+        finally:
+            db.close()
+
+    return wrapper
@@ -1,5 +1,11 @@
 from . import db_schema
 from . import db_insert_queries
 from . import db_select_queries
+from . import db_bulk
+from . import db_keycache
+from . import db_ingest
+from . import db_writer
+from . import db_layout
+from . import db_admin
 from .db_populate import *
 from .Database import Database, db_connection
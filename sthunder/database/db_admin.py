@@ -0,0 +1,120 @@
+"""
+Administrative units (:mod: `sthunder.database.db_admin`)
+
+This module provides the coordinate to city/state/region/country mapping,
+computed once from the unit geometries, and the hourly and monthly flash
+rollups per unit built on top of it. Rollups are refreshed for a time range
+only, so ingesting a new month does not recompute the previous ones.
+"""
+
+import numpy as np
+from sqlalchemy import text
+
+
+LEVELS = ('city', 'state', 'region', 'country')
+
+
+def build_coordinate_admin_units(engine):
+    """
+    build_coordinate_admin_units(engine)
+
+    Map every `flash_coordinate` not mapped yet to the city, state, region
+    and country containing it. Coordinates outside every unit of a level
+    are stored with a NULL unit, so they are not joined again on the next
+    call.
+
+    Returns
+    -------
+    int
+        Number of coordinates mapped.
+
+    """
+    units = ',\n'.join(
+        f"(SELECT u.id FROM {level} u WHERE ST_Contains(u.geom, fc.geom) "
+        f"ORDER BY u.id LIMIT 1) AS {level}"
+        for level in LEVELS
+    )
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            f"INSERT INTO coordinate_admin_unit (coords, {', '.join(LEVELS)}) "
+            f"SELECT fc.id, {units} FROM flash_coordinate fc "
+            f"WHERE NOT EXISTS (SELECT 1 FROM coordinate_admin_unit m "
+            f"WHERE m.coords = fc.id)"
+        ))
+
+    return result.rowcount
+
+
+def month_bounds(start, end):
+    """
+    month_bounds(start, end)
+
+    Return the first instant of the month of `start` and of the month
+    after the one of the last instant before `end`.
+    """
+    start = np.datetime64(start, 's')
+    end = np.datetime64(end, 's') - np.timedelta64(1, 's')
+
+    return (start.astype('datetime64[M]').astype('datetime64[s]'),
+            (end.astype('datetime64[M]') + 1).astype('datetime64[s]'))
+
+
+def refresh_rollups(engine, start, end, levels=LEVELS):
+    """
+    refresh_rollups(engine, start, end, levels=LEVELS)
+
+    Recompute the hourly rollups of [start, end) and the monthly rollups
+    of every month it touches.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        Database engine.
+    start : str or numpy.datetime64
+        First datetime of the refreshed range.
+    end : str or numpy.datetime64
+        Datetime after the last one of the refreshed range.
+    levels : tuple, optional
+        Admin levels to refresh. The default is `LEVELS`.
+
+    Examples
+    --------
+    >>> from sthunder.database import db_admin
+    >>> db_admin.refresh_rollups(engine, '2020-03-01', '2020-04-01')
+
+    """
+    mstart, mend = month_bounds(start, end)
+    params = {'start': str(np.datetime64(start, 's')),
+              'end': str(np.datetime64(end, 's')),
+              'mstart': str(mstart), 'mend': str(mend)}
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM flash_admin_hourly h USING flash_datetime d "
+            "WHERE h.time = d.id AND d.datetime >= :start "
+            "AND d.datetime < :end"
+        ), params)
+        for level in levels:
+            conn.execute(text(
+                f"INSERT INTO flash_admin_hourly (level, unit, time, total) "
+                f"SELECT '{level}', m.{level}, f.time, sum(f.total) "
+                f"FROM flash_spatio_temporal f "
+                f"JOIN coordinate_admin_unit m ON m.coords = f.coords "
+                f"JOIN flash_datetime d ON d.id = f.time "
+                f"WHERE d.datetime >= :start AND d.datetime < :end "
+                f"AND m.{level} IS NOT NULL "
+                f"GROUP BY m.{level}, f.time"
+            ), params)
+
+        conn.execute(text(
+            "DELETE FROM flash_admin_monthly "
+            "WHERE month >= :mstart AND month < :mend"
+        ), params)
+        conn.execute(text(
+            "INSERT INTO flash_admin_monthly (level, unit, month, total) "
+            "SELECT h.level, h.unit, date_trunc('month', d.datetime), "
+            "sum(h.total) FROM flash_admin_hourly h "
+            "JOIN flash_datetime d ON d.id = h.time "
+            "WHERE d.datetime >= :mstart AND d.datetime < :mend "
+            "GROUP BY h.level, h.unit, date_trunc('month', d.datetime)"
+        ), params)
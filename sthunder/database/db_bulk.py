@@ -0,0 +1,201 @@
+"""
+Bulk ingestion (:mod: `sthunder.database.db_bulk`)
+
+This module provides functions to load `flash_spatio_temporal` rows in
+batches, with PostgreSQL COPY or multi-row executemany, instead of one
+session and commit per row.
+"""
+
+import io
+import time as tm
+import numpy as np
+
+
+FLASH_COLUMNS = ('time', 'coords', 'total')
+
+
+def build_flash_rows(time_ids, coord_ids, totals, sparse=False):
+    """
+    build_flash_rows(time_ids, coord_ids, totals, sparse=False)
+
+    Build the `flash_spatio_temporal` rows of a block of hours.
+
+    Parameters
+    ----------
+    time_ids : numpy.ndarray
+        Datetime ids, shape (nt,).
+    coord_ids : numpy.ndarray
+        Coordinate ids, shape (nc,).
+    totals : numpy.ndarray
+        Flash totals, shape (nt, nc).
+    sparse : bool, optional
+        If only rows with non-zero totals must be built. The default is
+        False.
+
+    Returns
+    -------
+    numpy.ndarray
+        Integer matrix with shape (nt*nc, 3), or (nnz, 3) when `sparse`,
+        and columns time, coords, total.
+
+    """
+    totals = np.nan_to_num(totals)
+    if sparse:
+        it, ic = np.nonzero(totals)
+        rows = np.empty((len(it), 3), dtype=np.int64)
+        rows[:, 0] = np.asarray(time_ids)[it]
+        rows[:, 1] = np.asarray(coord_ids)[ic]
+        rows[:, 2] = totals[it, ic]
+        return rows
+
+    nt, nc = totals.shape
+    rows = np.empty((nt*nc, 3), dtype=np.int64)
+    rows[:, 0] = np.repeat(time_ids, nc)
+    rows[:, 1] = np.tile(coord_ids, nt)
+    rows[:, 2] = totals.ravel()
+
+    return rows
+
+
+def copy_rows(connection, rows, table='flash_spatio_temporal',
+              columns=FLASH_COLUMNS):
+    """
+    copy_rows(connection, rows, table='flash_spatio_temporal',
+              columns=FLASH_COLUMNS)
+
+    Load `rows` with PostgreSQL COPY through a psycopg2 DBAPI connection.
+    """
+    buffer = io.StringIO()
+    np.savetxt(buffer, rows, fmt='%d', delimiter=',')
+    buffer.seek(0)
+
+    cursor = connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+    cursor.close()
+
+
+def executemany_rows(connection, rows, table='flash_spatio_temporal',
+                     columns=FLASH_COLUMNS):
+    """
+    executemany_rows(connection, rows, table='flash_spatio_temporal',
+                     columns=FLASH_COLUMNS)
+
+    Load `rows` with a multi-row executemany through a DBAPI connection.
+    """
+    cursor = connection.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})",
+        rows.tolist()
+    )
+    cursor.close()
+
+
+def delete_flash_times(connection, time_ids, table='flash_spatio_temporal'):
+    """
+    delete_flash_times(connection, time_ids, table='flash_spatio_temporal')
+
+    Delete the fact rows of the given datetime ids, without committing.
+    """
+    cursor = connection.cursor()
+    cursor.execute(f"DELETE FROM {table} WHERE time = ANY(%s)",
+                   (list(map(int, time_ids)),))
+    cursor.close()
+
+
+def bulk_insert_flash(connection, time_ids, coord_ids, totals, cells=None,
+                      method='copy', chunk_size=24, sparse=False, start=0,
+                      replace_start=False, on_commit=None, verbose=True):
+    """
+    bulk_insert_flash(connection, time_ids, coord_ids, totals, cells=None,
+                      method='copy', chunk_size=24, sparse=False, start=0,
+                      replace_start=False, on_commit=None, verbose=True)
+
+    Insert a whole block of flash totals, one transaction per chunk of hours.
+
+    Parameters
+    ----------
+    connection : DBAPI connection
+        A psycopg2 connection, e.g. from `Database.raw_connection`.
+    time_ids : numpy.ndarray
+        Datetime ids, shape (nt,).
+    coord_ids : numpy.ndarray
+        Coordinate ids, shape (nc,).
+    totals : numpy.ndarray or xarray.DataArray
+        Flash totals, shape (nt, nc), or (nt, nlat, nlon) together with
+        `cells`. A lazily opened DataArray is read one chunk at a time.
+    cells : tuple, optional
+        Lat and lon indices of the cells to load from a gridded `totals`,
+        aligned with `coord_ids`. The default is None.
+    method : str, optional
+        Load method. The default is 'copy'. The options avaiable are 'copy'
+        and 'executemany'.
+    chunk_size : int, optional
+        Number of hours committed per transaction. The default is 24.
+    sparse : bool, optional
+        If only non-zero totals must be stored. Readers such as
+        `db_select_queries.select_flash_dense` restore the implied zeros.
+        The default is False.
+    start : int, optional
+        Index of the first hour to load, used to resume an interrupted
+        load. The default is 0.
+    replace_start : bool, optional
+        If rows already stored for the first chunk must be deleted in the
+        same transaction, for a chunk that may have been committed before
+        its checkpoint was written. The default is False.
+    on_commit : callable, optional
+        Called with the index of the next hour to load after each chunk is
+        committed. The default is None.
+    verbose : bool, optional
+        If throughput must be printed per chunk. The default is True.
+
+    Returns
+    -------
+    dict
+        Number of rows inserted, elapsed seconds and rows per second.
+
+    """
+    if method == 'copy':
+        load = copy_rows
+    elif method == 'executemany':
+        load = executemany_rows
+    else:
+        raise ValueError(
+            "method argument value must be 'copy' or 'executemany'"
+        )
+
+    nrows = 0
+    t_start = tm.perf_counter()
+    for t0 in range(start, len(time_ids), chunk_size):
+        t1 = min(t0 + chunk_size, len(time_ids))
+        block = np.asarray(totals[t0:t1])
+        if cells is not None:
+            block = block[:, cells[0], cells[1]]
+        rows = build_flash_rows(time_ids[t0:t1], coord_ids, block, sparse)
+
+        try:
+            if replace_start and t0 == start:
+                delete_flash_times(connection, time_ids[t0:t1])
+            if len(rows):
+                load(connection, rows)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+        if on_commit is not None:
+            on_commit(t1)
+
+        nrows += len(rows)
+        elapsed = tm.perf_counter() - t_start
+        if verbose:
+            print(f"hours {t0}-{t1}: {nrows} rows, "
+                  f"{nrows/max(elapsed, 1e-9):.0f} rows/s")
+
+    elapsed = tm.perf_counter() - t_start
+
+    return {'rows': nrows, 'seconds': elapsed,
+            'rows_per_second': nrows/max(elapsed, 1e-9)}
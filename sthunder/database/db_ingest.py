@@ -0,0 +1,170 @@
+"""
+Multi-file ingestion (:mod: `sthunder.database.db_ingest`)
+
+This module provides a driver that loads every GLM file of a directory with
+`job_flash` on a process pool. Progress is checkpointed per file and per
+committed chunk of hours, so an interrupted run resumes where it stopped.
+"""
+
+import os
+import json
+import time as tm
+import multiprocessing as mp
+import numpy as np
+from sthunder import constants as const
+from sthunder.database import db_admin
+from sthunder.database.Database import Database, get_engine
+from sthunder.database.db_keycache import DimensionKeyCache
+from sthunder.database.db_populate import job_flash
+from sthunder.glm.glm_reader import list_glm_files, read_axes
+
+
+_CACHE = None
+
+
+def checkpoint_path(checkpoint_dir, filename):
+    return os.path.join(checkpoint_dir, f"{os.path.basename(filename)}.json")
+
+
+def read_checkpoint(checkpoint_dir, filename):
+    """
+    read_checkpoint(checkpoint_dir, filename)
+
+    Return the checkpoint of `filename`, or None if it was never started.
+    The checkpoint is a dict with the keys 'hour', the next hour to load,
+    and 'done'.
+    """
+    path = checkpoint_path(checkpoint_dir, filename)
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_checkpoint(checkpoint_dir, filename, hour, done=False):
+    """
+    write_checkpoint(checkpoint_dir, filename, hour, done=False)
+
+    Atomically replace the checkpoint of `filename`.
+    """
+    path = checkpoint_path(checkpoint_dir, filename)
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump({'filename': filename, 'hour': hour, 'done': done}, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def _ingest_file(args):
+    global _CACHE
+    filename, checkpoint_dir, method, chunk_size, sparse = args
+
+    checkpoint = read_checkpoint(checkpoint_dir, filename)
+    if checkpoint is not None and checkpoint['done']:
+        return filename, None
+
+    start = 0 if checkpoint is None else checkpoint['hour']
+    write_checkpoint(checkpoint_dir, filename, start)
+
+    committed = [start]
+
+    def on_commit(hour):
+        committed[0] = hour
+        write_checkpoint(checkpoint_dir, filename, hour)
+
+    if _CACHE is None:
+        db = Database()
+        _CACHE = DimensionKeyCache(db.session)
+        db.close()
+
+    stats = job_flash(filename, method=method, chunk_size=chunk_size,
+                      sparse=sparse, cache=_CACHE, start=start,
+                      resume=checkpoint is not None, on_commit=on_commit)
+    write_checkpoint(checkpoint_dir, filename, committed[0], True)
+
+    return filename, stats
+
+
+def ingest_glm_files(directory=const.DIR_GLM_FILES, processes=4,
+                     checkpoint_dir=None, method='copy', chunk_size=24,
+                     sparse=False, refresh_rollups=False):
+    """
+    ingest_glm_files(directory=const.DIR_GLM_FILES, processes=4,
+                     checkpoint_dir=None, method='copy', chunk_size=24,
+                     sparse=False, refresh_rollups=False)
+
+    Ingest every GLM file of `directory` with `job_flash` on a process pool.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory with the GLM hourly NetCDF files. The default is
+        `const.DIR_GLM_FILES`.
+    processes : int, optional
+        Number of worker processes. The default is 4.
+    checkpoint_dir : str, optional
+        Directory of the per-file checkpoints. The default is
+        `const.DIR_CACHE`/ingest. Removing it restarts the ingestion from
+        scratch.
+    method : str, optional
+        Bulk load method, 'copy' or 'executemany'. The default is 'copy'.
+    chunk_size : int, optional
+        Number of hours per transaction and checkpoint. The default is 24.
+    sparse : bool, optional
+        If only non-zero totals must be stored. The default is False.
+    refresh_rollups : bool, optional
+        If the admin unit rollups of each file's time range must be
+        refreshed once the file is loaded. The default is False.
+
+    Returns
+    -------
+    dict
+        Statistics of every file loaded in this run, keyed by filename.
+
+    Examples
+    --------
+    >>> from sthunder.database import db_ingest
+    >>> db_ingest.ingest_glm_files(processes=6)
+
+    """
+    checkpoint_dir = checkpoint_dir or os.path.join(const.DIR_CACHE, 'ingest')
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    filenames = list_glm_files(directory)
+    tasks = [(filename, checkpoint_dir, method, chunk_size, sparse)
+             for filename in filenames]
+
+    if refresh_rollups:
+        db_admin.build_coordinate_admin_units(get_engine())
+
+    results = {}
+    nrows = 0
+    start = tm.perf_counter()
+    # Workers must not inherit the parent's connection pool.
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(processes=processes) as pool:
+        for i, (filename, stats) in enumerate(
+                pool.imap_unordered(_ingest_file, tasks)):
+            elapsed = tm.perf_counter() - start
+            if stats is None:
+                print(f"[{i+1}/{len(tasks)}] {filename}: already ingested")
+                continue
+
+            results[filename] = stats
+            nrows += stats['rows']
+            print(f"[{i+1}/{len(tasks)}] {filename}: {stats['rows']} rows, "
+                  f"{stats['rows_per_second']:.0f} rows/s "
+                  f"(total {nrows} rows, {nrows/max(elapsed, 1e-9):.0f} "
+                  f"rows/s)")
+
+            if refresh_rollups:
+                times = read_axes(filename)[2]
+                db_admin.refresh_rollups(
+                    get_engine(), times.min(),
+                    times.max() + np.timedelta64(1, 'h')
+                )
+
+    return results
+
+
+if __name__ == "__main__":
+    ingest_glm_files()
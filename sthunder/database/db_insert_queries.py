@@ -1,4 +1,6 @@
 import os
+import numpy as np
+from shapely import wkt as swkt
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 from wlts import WLTS
@@ -21,7 +23,15 @@ def insert_coords(session, coordinates):
 
 
 @db_connection
-def insert_flash(session, time, coords, total):
+def insert_flash(session, time, coords, total, cache=None):
+    if cache is not None:
+        point = swkt.loads(coords)
+        dtc = int(cache.time_ids([np.datetime64(time)])[0])
+        gc = int(cache.coord_ids([point.x], [point.y])[0])
+        session.add(dbs.FlashSpatioTemporal(time=dtc, coords=gc, total=total))
+        session.commit()
+        return
+
     dtc = session.execute(
         select(
             dbs.FlashDatetime.id
@@ -0,0 +1,211 @@
+"""
+Dimension key cache (:mod: `sthunder.database.db_keycache`)
+
+This module provides an in-process cache of the `flash_datetime` and
+`flash_coordinate` ids, so fact rows can be built without per-row lookup
+queries.
+"""
+
+import numpy as np
+from sqlalchemy import select, insert, func, text
+from sthunder.database import db_schema as dbs
+
+
+def time_keys(times):
+    """
+    time_keys(times)
+
+    Encode datetimes as int64 seconds since epoch.
+    """
+    return np.asarray(times).astype('datetime64[s]').astype(np.int64)
+
+
+def coord_keys(lons, lats):
+    """
+    coord_keys(lons, lats)
+
+    Encode (lon, lat) pairs as int64 keys with micro-degree precision.
+    """
+    lon_u = np.round((np.asarray(lons, dtype=np.float64) + 180) * 1e6)
+    lat_u = np.round((np.asarray(lats, dtype=np.float64) + 90) * 1e6)
+
+    return (lon_u.astype(np.int64) << 32) | lat_u.astype(np.int64)
+
+
+class _KeyIndex:
+    """
+    Sorted int64 keys and their ids, looked up with `numpy.searchsorted`.
+    """
+
+    def __init__(self, keys=(), ids=()):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.update(keys, ids)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, keys, ids):
+        keys = np.asarray(keys, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(keys):
+            return
+        keys = np.concatenate([self.keys, keys])
+        ids = np.concatenate([self.ids, ids])
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.ids = keys[order], ids[order]
+
+    def contains(self, keys):
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+        return self.keys[pos] == keys
+
+    def lookup(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        found = self.contains(keys)
+        if not found.all():
+            raise KeyError(f"{(~found).sum()} keys not found in cache")
+        return self.ids[np.searchsorted(self.keys, keys)]
+
+
+class DimensionKeyCache:
+    """
+    DimensionKeyCache(session=None)
+
+    Map datetimes and grid coordinates to their dimension ids.
+
+    Both maps are preloaded with one query per dimension and kept as sorted
+    int64 arrays. Keys inserted through `add_datetimes` and `add_coords` are
+    added to the cache, so it stays consistent during an ingestion job.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session, optional
+        Open database session used to preload the cache. The default is
+        None, which creates an empty cache.
+
+    Examples
+    --------
+    >>> cache = DimensionKeyCache(db.session)
+    >>> time_ids = cache.time_ids(nc['time'].values)
+    >>> coord_ids = cache.coord_ids(lons, lats)
+
+    """
+
+    def __init__(self, session=None):
+        self.times = _KeyIndex()
+        self.coords = _KeyIndex()
+        if session is not None:
+            self.load(session)
+
+    def load(self, session):
+        """
+        Preload both dimensions from the database.
+        """
+        rows = session.execute(
+            select(dbs.FlashDatetime.id, dbs.FlashDatetime.datetime)
+        ).all()
+        if rows:
+            ids, datetimes = zip(*rows)
+            self.times = _KeyIndex(
+                time_keys(np.array(datetimes, dtype='datetime64[s]')), ids
+            )
+
+        rows = session.execute(
+            select(
+                dbs.FlashCoordinate.id,
+                func.ST_X(dbs.FlashCoordinate.geom),
+                func.ST_Y(dbs.FlashCoordinate.geom)
+            )
+        ).all()
+        if rows:
+            ids, lons, lats = zip(*rows)
+            self.coords = _KeyIndex(coord_keys(lons, lats), ids)
+
+        return self
+
+    def time_ids(self, times):
+        """
+        Return the `flash_datetime.id` of every datetime in `times`.
+        """
+        return self.times.lookup(time_keys(times))
+
+    def coord_ids(self, lons, lats):
+        """
+        Return the `flash_coordinate.id` of every (lon, lat) pair.
+        """
+        return self.coords.lookup(coord_keys(lons, lats))
+
+    def add_datetimes(self, session, times):
+        """
+        add_datetimes(session, times)
+
+        Insert the datetimes of `times` not yet in the cache with a single
+        statement and add their ids to the cache.
+
+        Returns
+        -------
+        int
+            Number of datetimes inserted.
+
+        """
+        keys = np.unique(time_keys(times))
+        keys = keys[~self.times.contains(keys)]
+        if not len(keys):
+            return 0
+
+        values = [{'datetime': str(t)} for t in keys.astype('datetime64[s]')]
+        rows = session.execute(
+            insert(dbs.FlashDatetime).values(values).returning(
+                dbs.FlashDatetime.id, dbs.FlashDatetime.datetime
+            )
+        ).all()
+        session.commit()
+
+        ids, datetimes = zip(*rows)
+        self.times.update(
+            time_keys(np.array(datetimes, dtype='datetime64[s]')), ids
+        )
+
+        return len(rows)
+
+    def add_coords(self, session, lons, lats):
+        """
+        add_coords(session, lons, lats)
+
+        Insert the (lon, lat) pairs not yet in the cache with a single
+        statement and add their ids to the cache. Points are built
+        server-side from two unnested arrays, so the statement has two
+        parameters whatever the number of points.
+
+        Returns
+        -------
+        int
+            Number of coordinates inserted.
+
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        keys, idx = np.unique(coord_keys(lons, lats), return_index=True)
+        idx = idx[~self.coords.contains(keys)]
+        if not len(idx):
+            return 0
+
+        rows = session.execute(
+            text(
+                "INSERT INTO flash_coordinate (geom) "
+                "SELECT ST_MakePoint(lon, lat) FROM "
+                "unnest(CAST(:lons AS float8[]), CAST(:lats AS float8[])) "
+                "AS points(lon, lat) "
+                "RETURNING id, ST_X(geom), ST_Y(geom)"
+            ),
+            {'lons': lons[idx].tolist(), 'lats': lats[idx].tolist()}
+        ).all()
+        session.commit()
+
+        ids, rlons, rlats = zip(*rows)
+        self.coords.update(coord_keys(rlons, rlats), ids)
+
+        return len(rows)
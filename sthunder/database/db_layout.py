@@ -0,0 +1,190 @@
+"""
+Physical layout (:mod: `sthunder.database.db_layout`)
+
+This module provides the create and migration steps for the partitions and
+indexes of the database. The intended order for a new database is
+
+    1. `create_schema`: tables and the default fact partition.
+    2. `db_populate.job_datetime`, `job_coords` and the admin units.
+    3. `create_monthly_partitions`: one fact partition per month.
+    4. Bulk load of `flash_spatio_temporal`.
+    5. `create_indexes`: B-tree and GiST indexes, then ANALYZE.
+
+Indexes are built after the load because maintaining them row by row is
+much slower than building them once.
+"""
+
+from sqlalchemy import text
+from sthunder.database import db_schema as dbs
+
+
+FACT_TABLE = 'flash_spatio_temporal'
+
+BTREE_INDEXES = (
+    ('flash_datetime', 'datetime'),
+    (FACT_TABLE, 'time'),
+    (FACT_TABLE, 'coords'),
+    ('land_class', 'coords'),
+    ('state', 'country'),
+    ('city', 'state'),
+    ('region', 'country'),
+    ('coordinate_admin_unit', 'city'),
+    ('coordinate_admin_unit', 'state'),
+    ('flash_admin_hourly', 'time'),
+)
+
+
+def geometry_columns():
+    """
+    geometry_columns()
+
+    Return the (table, column) pairs of every geometry column of the schema.
+    """
+    return [(table.name, column.name)
+            for table in dbs.Base.metadata.sorted_tables
+            for column in table.columns
+            if column.type.__class__.__name__ == 'Geometry']
+
+
+def index_name(table, column):
+    return f"ix_{table}_{column}"
+
+
+def create_schema(engine):
+    """
+    create_schema(engine)
+
+    Create every table, with `flash_spatio_temporal` partitioned by range
+    of `time`, and its default partition.
+    """
+    dbs.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {FACT_TABLE}_default "
+            f"PARTITION OF {FACT_TABLE} DEFAULT"
+        ))
+
+
+def create_monthly_partitions(engine):
+    """
+    create_monthly_partitions(engine)
+
+    Create one `flash_spatio_temporal` partition per month of
+    `flash_datetime`.
+
+    Partitions are bounded by the `flash_datetime.id` range of each month,
+    so the ids of a month must be contiguous, as written by
+    `db_populate.job_datetime`. Partitions must be created before their
+    rows are loaded, since rows already in the default partition block the
+    creation of a partition covering them.
+
+    Returns
+    -------
+    list
+        Names of the partitions created.
+
+    """
+    with engine.begin() as conn:
+        months = conn.execute(text(
+            "SELECT to_char(datetime, 'YYYY_MM') AS month, min(id), max(id) "
+            "FROM flash_datetime GROUP BY month ORDER BY min(id)"
+        )).all()
+
+        for (_, _, last), (month, first, _) in zip(months, months[1:]):
+            if first <= last:
+                raise ValueError(
+                    f"flash_datetime ids of {month} overlap the previous "
+                    f"month, monthly partitions need contiguous ids"
+                )
+
+        created = []
+        for month, first, last in months:
+            name = f"{FACT_TABLE}_{month}"
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF "
+                f"{FACT_TABLE} FOR VALUES FROM ({first}) TO ({last + 1})"
+            ))
+            created.append(name)
+
+    return created
+
+
+def create_indexes(engine, analyze=True):
+    """
+    create_indexes(engine, analyze=True)
+
+    Build the B-tree indexes of the foreign keys and of
+    `flash_datetime.datetime`, and the GiST indexes of every geometry
+    column. Indexes of the partitioned fact table cascade to its
+    partitions.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        Database engine.
+    analyze : bool, optional
+        If statistics must be refreshed afterwards. The default is True.
+
+    """
+    with engine.begin() as conn:
+        for table, column in BTREE_INDEXES:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name(table, column)} "
+                f"ON {table} ({column})"
+            ))
+        for table, column in geometry_columns():
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name(table, column)} "
+                f"ON {table} USING gist ({column})"
+            ))
+
+    if analyze:
+        with engine.connect().execution_options(
+                isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text("ANALYZE"))
+
+
+def drop_indexes(engine, tables=(FACT_TABLE,)):
+    """
+    drop_indexes(engine, tables=(FACT_TABLE,))
+
+    Drop the indexes of `tables` created by `create_indexes`, e.g. before
+    loading a large batch of months.
+    """
+    indexes = BTREE_INDEXES + tuple(geometry_columns())
+    with engine.begin() as conn:
+        for table, column in indexes:
+            if table in tables:
+                conn.execute(text(
+                    f"DROP INDEX IF EXISTS {index_name(table, column)}"
+                ))
+
+
+def migrate_to_partitioned(engine):
+    """
+    migrate_to_partitioned(engine)
+
+    Move an existing, non-partitioned `flash_spatio_temporal` into the
+    partitioned layout: monthly partitions are created first, rows are
+    copied and indexes are built once at the end.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE {FACT_TABLE} RENAME TO {FACT_TABLE}_old"
+        ))
+        conn.execute(text(
+            f"ALTER SEQUENCE IF EXISTS {FACT_TABLE}_id_seq "
+            f"RENAME TO {FACT_TABLE}_old_id_seq"
+        ))
+
+    create_schema(engine)
+    create_monthly_partitions(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO {FACT_TABLE} (total, time, coords) "
+            f"SELECT total, time, coords FROM {FACT_TABLE}_old"
+        ))
+        conn.execute(text(f"DROP TABLE {FACT_TABLE}_old"))
+
+    create_indexes(engine)
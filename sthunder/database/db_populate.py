@@ -1,48 +1,53 @@
 import os
 import xarray as xr
 import numpy as np
-import db_queries as dbq
 from sqlalchemy import select, create_engine, Table, func
-from db_schema import FlashDatetime, FlashCoordinate
 from sqlalchemy.orm import sessionmaker
 import geopandas as gpd
 from shapely.geometry import Point
-from .Database import Database
+from sthunder import constants as const
+from sthunder import helpers
+from sthunder import glm
+from sthunder.database import db_insert_queries as dbq
+from sthunder.database import db_bulk
+from sthunder.database import db_schema as dbs
+from sthunder.database.db_keycache import DimensionKeyCache
+from sthunder.database.db_schema import FlashDatetime, FlashCoordinate
+from sthunder.database.Database import Database
+from sthunder.database.db_writer import BatchWriter
 
 
-def job_datetime():
-    path_nc = "/glm/G05GT1H"
-    filenames = [os.path.join(path_nc, file) for file in os.listdir(path_nc)]
+def job_datetime(filenames=None, cache=None):
+    filenames = filenames or glm.list_glm_files()
 
+    db = Database()
+    cache = cache or DimensionKeyCache(db.session)
     for filename in filenames:
-        nc = xr.load_dataset(filename)
-        datetimes = nc['time'].values
-
-        for datetime in datetimes:
-            dbq.insert_datetime(str(datetime))
+        datetimes = glm.read_axes(filename)[2]
 
+        print(filename, cache.add_datetimes(db.session, datetimes))
+    db.close()
 
-def job_coords():
-    path_nc = "/glm/G05GT1H"
-    filenames = [os.path.join(path_nc, file) for file in os.listdir(path_nc)]
 
-    slons = set()
-    slats = set()
+def job_coords(filenames=None, cache=None):
+    filenames = filenames or glm.list_glm_files()
 
+    lons, lats = [], []
     for filename in filenames:
-        nc = xr.load_dataset(filename)
-        lons = nc['lon'].values
-        lats = nc['lat'].values
+        flons, flats, _ = glm.read_axes(filename)
+        lons.append(flons)
+        lats.append(flats)
 
-        print(filename, len(lons), len(lats))
-        for lon in lons:
-            for lat in lats:
-                slons.add(lon)
-                slats.add(lat)
+        print(filename, len(flons), len(flats))
 
-    for lon in slons:
-        for lat in slats:
-            dbq.insert_coords(coordinates=f"POINT({lon} {lat})")
+    mlon, mlat = np.meshgrid(np.unique(np.concatenate(lons)),
+                             np.unique(np.concatenate(lats)))
+
+    db = Database()
+    cache = cache or DimensionKeyCache(db.session)
+    print(cache.add_coords(db.session, mlon.ravel(), mlat.ravel()),
+          "coordinates inserted")
+    db.close()
 
 
 # def job_flash(filename):
@@ -62,76 +67,152 @@ def job_coords():
 #
 #                 insert_flash(time=time, coords=coords, total=total)
 
-def job_flash(filename):
-    nc = xr.load_dataset(filename)
-    times = list(map(str, nc['time'].values))
+def job_flash(filename, mode='bulk', method='copy', chunk_size=24,
+              sparse=False, cache=None, start=0, resume=False,
+              on_commit=None):
+    """
+    job_flash(filename, mode='bulk', method='copy', chunk_size=24,
+              sparse=False, cache=None, start=0, resume=False,
+              on_commit=None)
+
+    Insert the Brazil flash totals of a GLM monthly file.
+
+    Parameters
+    ----------
+    filename : str
+        GLM hourly NetCDF file.
+    mode : str, optional
+        Ingestion mode. The default is 'bulk'. The options avaiable are
+        'bulk', which loads whole blocks of hours in one transaction each,
+        and 'row', which inserts one row per session.
+    method : str, optional
+        Bulk load method, 'copy' or 'executemany'. The default is 'copy'.
+    chunk_size : int, optional
+        Number of hours per bulk transaction. The default is 24.
+    sparse : bool, optional
+        If only non-zero totals must be stored. The default is False.
+    cache : sthunder.database.db_keycache.DimensionKeyCache, optional
+        Dimension ids used by the bulk mode. The default is None, which
+        preloads a new cache.
+    start : int, optional
+        Index of the first hour loaded by the bulk mode. The default is 0.
+    resume : bool, optional
+        If the bulk mode resumes an interrupted load, in which case rows
+        already stored for the first chunk are replaced. The default is
+        False.
+    on_commit : callable, optional
+        Called by the bulk mode with the index of the next hour to load
+        after each committed chunk. The default is None.
+
+    Returns
+    -------
+    dict or None
+        Bulk ingestion statistics, None in 'row' mode.
+
+    """
+    if mode not in ('bulk', 'row'):
+        raise ValueError("mode argument value must be 'bulk' or 'row'")
+
+    nc = glm.open_glm(filename, const.BBOX_BRAZIL)
     lons = nc['lon'].values
     lats = nc['lat'].values
-    totals = nc['var'].values
-
-    gdf = gpd.read_file("/home/adriano/CAP-395/data/GEO/Vector/"
-                        "SouthAmericaPolygon/South_America.shp")
-    brazil = gdf.query("COUNTRY == 'Brazil'").iloc[-0, -1]
-
-    blats, blons = [], []
-    for i, lat in enumerate(lats):
-        for j, lon in enumerate(lons):
-            coord = Point(lon, lat)
-            if brazil.contains(coord):
-                blats.append(i)
-                blons.append(j)
-
-    for i, time in enumerate(times):
-        for j, k in zip(blats, blons):
-            print(
-                f"{i}, {j}, {k}: {totals[i, j, k]}, POINT({lons[k]} {lats[j]})")
 
-            total = totals[i, j, k]
-            coords = f"POINT({lons[k]} {lats[j]})"
-            dbq.insert_flash(time=time, coords=coords, total=total)
-
-
-def job_country():
-    gdf = gpd.read_file(
-        "../../data/GEO/Vector/SouthAmericaPolygon/South_America.shp").to_crs(
-        "EPSG:4326")
-
-    for i, row in gdf.iterrows():
-        print(f"Inserting {row['COUNTRY']}")
-        name = row['COUNTRY'],
-        geom = row['geometry'].wkt
-
-        dbq.insert_country(name, geom)
+    blats, blons = np.nonzero(
+        helpers.get_grid_mask(lons, lats, const.SHP_SOUTH_AMERICA,
+                              'COUNTRY', 'Brazil')
+    )
+
+    if mode == 'bulk':
+        db = Database()
+        connection = db.raw_connection()
+        try:
+            cache = cache or DimensionKeyCache(db.session)
+            time_ids = cache.time_ids(nc['time'].values)
+            coord_ids = cache.coord_ids(lons[blons], lats[blats])
+            stats = db_bulk.bulk_insert_flash(
+                connection, time_ids, coord_ids, nc['var'],
+                cells=(blats, blons), method=method, chunk_size=chunk_size,
+                sparse=sparse, start=start, replace_start=resume,
+                on_commit=on_commit
+            )
+        finally:
+            connection.close()
+            db.close()
+            nc.close()
+
+        print(f"{filename}: {stats['rows']} rows in {stats['seconds']:.1f}s "
+              f"({stats['rows_per_second']:.0f} rows/s)")
+        return stats
+    nc.close()
+
+    if cache is None:
+        db = Database()
+        cache = DimensionKeyCache(db.session)
+        db.close()
+
+    i = 0
+    for times, totals in glm.iter_time_blocks(filename, chunk_size,
+                                              bbox=const.BBOX_BRAZIL):
+        for time, total in zip(map(str, times), totals):
+            for j, k in zip(blats, blons):
+                if sparse and not total[j, k]:
+                    continue
+                print(f"{i}, {j}, {k}: {total[j, k]}, "
+                      f"POINT({lons[k]} {lats[j]})")
+
+                coords = f"POINT({lons[k]} {lats[j]})"
+                dbq.insert_flash(time=time, coords=coords, total=total[j, k],
+                                 cache=cache)
+            i += 1
+
+
+def job_country(batch_size=100):
+    gdf = helpers.read_layer(const.SHP_SOUTH_AMERICA)
+
+    with BatchWriter(batch_size=batch_size) as writer:
+        for i, row in gdf.iterrows():
+            print(f"Inserting {row['COUNTRY']}")
+            writer.add(dbs.Country, name=row['COUNTRY'],
+                       geom=row['geometry'].wkt)
 
 
 def job_land_class():
     pass
 
 
-def job_region():
-    gdf = gpd.read_file(
-        "/home/adriano/CAP-395/data/GEO/Vector/BrazilRegionsPolygon/regioes_2010.shp").to_crs(
-        "EPSG:4326")
+def job_region(batch_size=100):
+    gdf = helpers.read_layer(const.SHP_BRAZIL_REGIONS)
+
+    with BatchWriter(batch_size=batch_size) as writer:
+        for i, row in gdf.iterrows():
+            print(row['nome'])
+            writer.add(dbs.Region, name=row['nome'], country=3,
+                       geom=row['geometry'].wkt)
+
 
-    for i, row in gdf.iterrows():
-        print(row)
-        dbq.insert_region(name=row['nome'], country=3, geom=row['geometry'].wkt)
+def job_state(batch_size=100):
+    gdf = helpers.read_layer(const.SHP_BRAZIL_STATES)
 
-def job_state():
-    gdf = gpd.read_file(
-        "/home/adriano/CAP-395/data/GEO/Vector/brazil-uf-shapefile/estados_2010.shp").to_crs(
-        "EPSG:4326")
+    with BatchWriter(batch_size=batch_size) as writer:
+        for i, row in gdf.iterrows():
+            print(row['nome'])
+            writer.add(dbs.State, name=row['nome'], country=3,
+                       uf=row['sigla'], geom=row['geometry'].wkt)
 
-    for i, row in gdf.iterrows():
-        print(row)
-        dbq.insert_state(name=row['nome'], country=3, uf=row['sigla'], geom=row['geometry'].wkt)
 
+def job_city(batch_size=500):
+    gdf = helpers.read_layer(const.SHP_BRAZIL_CITIES)
 
-def job_city():
-    gdf = gpd.read_file("/home/adriano/CAP-395/data/GEO/Vector/BrazilCitiesPolygon/municipios_2010.shp").to_crs('EPSG:4326')
+    with BatchWriter(batch_size=batch_size) as writer:
+        states = dict(writer.db.session.execute(
+            select(dbs.State.uf, dbs.State.id)
+        ).all())
 
-    for i, row in gdf.iterrows():
-        dbq.insert_city(name=row['nome'], uf=row['uf'], population=row['populacao'], gpd=row['pib'], geom=row['geometry'].wkt)
+        for i, row in gdf.iterrows():
+            writer.add(dbs.City, name=row['nome'], state=states[row['uf']],
+                       uf=row['uf'], population=row['populacao'],
+                       gpd=row['pib'], geom=row['geometry'].wkt)
+        print(f"{writer.nwritten + writer.nbuffered} cities")
 
 
 def job_land_class():
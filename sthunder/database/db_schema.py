@@ -2,7 +2,8 @@ import os
 from sqlalchemy import create_engine, select, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, \
+    ForeignKey
 from sqlalchemy.orm import sessionmaker
 from geoalchemy2 import Geometry
 from shapely import wkt as swkt
@@ -25,16 +26,18 @@ class FlashDatetime(Base):
 class FlashCoordinate(Base):
     __tablename__ = 'flash_coordinate'
     id = Column(Integer, primary_key=True)
-    geom = Column(Geometry('POINT'), unique=True)
+    geom = Column(Geometry('POINT', spatial_index=False), unique=True)
     flash = relationship("FlashSpatioTemporal")
     land_class = relationship("LandClass")
 
 
 class FlashSpatioTemporal(Base):
     __tablename__ = 'flash_spatio_temporal'
-    id = Column(Integer, primary_key=True)
+    # Range partitioned by time, see db_layout.create_monthly_partitions.
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time)'}
+    id = Column(Integer, primary_key=True, autoincrement=True)
     total = Column(Integer)
-    time = Column(Integer, ForeignKey('flash_datetime.id'))
+    time = Column(Integer, ForeignKey('flash_datetime.id'), primary_key=True)
     coords = Column(Integer, ForeignKey('flash_coordinate.id'))
 
 
@@ -42,7 +45,7 @@ class Country(Base):
     __tablename__ = 'country'
     id = Column(Integer, primary_key=True)
     name = Column(String(150))
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
     country_state = relationship("State")
     country_biome = relationship("Biome")
     country_watershed = relationship("Watershed")
@@ -56,7 +59,7 @@ class State(Base):
     name = Column(String(150))
     country = Column(Integer, ForeignKey('country.id'))
     uf = Column(String(5))
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
     state_city = relationship("City")
 
 
@@ -68,7 +71,7 @@ class City(Base):
     uf = Column(String(5))
     population = Column(Integer)
     gpd = Column(Float)
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
 
 
 class Biome(Base):
@@ -76,7 +79,7 @@ class Biome(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(150))
     country = Column(Integer, ForeignKey('country.id'))
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
 
 
 class Watershed(Base):
@@ -84,7 +87,7 @@ class Watershed(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(150))
     country = Column(Integer, ForeignKey('country.id'))
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
 
 
 class Region(Base):
@@ -92,7 +95,7 @@ class Region(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(150))
     country = Column(Integer, ForeignKey('country.id'))
-    geom = Column(Geometry('GEOMETRY'))
+    geom = Column(Geometry('GEOMETRY', spatial_index=False))
 
 
 class LandClass(Base):
@@ -104,6 +107,32 @@ class LandClass(Base):
     coords = Column(Integer, ForeignKey('flash_coordinate.id'))
 
 
+class CoordinateAdminUnit(Base):
+    __tablename__ = 'coordinate_admin_unit'
+    coords = Column(Integer, ForeignKey('flash_coordinate.id'),
+                    primary_key=True)
+    city = Column(Integer, ForeignKey('city.id'))
+    state = Column(Integer, ForeignKey('state.id'))
+    region = Column(Integer, ForeignKey('region.id'))
+    country = Column(Integer, ForeignKey('country.id'))
+
+
+class FlashAdminHourly(Base):
+    __tablename__ = 'flash_admin_hourly'
+    level = Column(String(10), primary_key=True)
+    unit = Column(Integer, primary_key=True)
+    time = Column(Integer, ForeignKey('flash_datetime.id'), primary_key=True)
+    total = Column(BigInteger)
+
+
+class FlashAdminMonthly(Base):
+    __tablename__ = 'flash_admin_monthly'
+    level = Column(String(10), primary_key=True)
+    unit = Column(Integer, primary_key=True)
+    month = Column(DateTime, primary_key=True)
+    total = Column(BigInteger)
+
+
 # class MonthlyStateFlashesView(Base):
 #     __table__ = create_view(
 #         name='monthly_state_flashes_view',
@@ -144,4 +173,7 @@ if __name__ == "__main__":
 
     engine = create_engine(DB_URI, echo=True)
 
-    Base.metadata.create_all(engine)
+    # Monthly partitions and indexes are created later by db_layout, the
+    # indexes only after the bulk load.
+    from sthunder.database import db_layout
+    db_layout.create_schema(engine)
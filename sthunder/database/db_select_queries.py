@@ -0,0 +1,89 @@
+import numpy as np
+from sqlalchemy import select
+from sthunder.database import db_schema as dbs
+from sthunder.database.Database import db_connection
+
+
+@db_connection
+def select_flash_dense(session, start, end, coord_ids=None):
+    """
+    select_flash_dense(start, end, coord_ids=None)
+
+    Select the hourly flash totals of [start, end) as a dense matrix.
+
+    Hours and coordinates without a `flash_spatio_temporal` row are zeros,
+    so the result is the same whether the table was populated in dense or
+    sparse mode.
+
+    Parameters
+    ----------
+    start : str
+        First datetime, e.g. '2020-01-01 00:00'.
+    end : str
+        Datetime after the last one.
+    coord_ids : array_like, optional
+        `flash_coordinate.id` of the columns. The default is None, every
+        coordinate.
+
+    Returns
+    -------
+    tuple
+        times numpy.ndarray with shape (nt,), coord_ids numpy.ndarray with
+        shape (nc,) and totals numpy.ndarray with shape (nt, nc).
+
+    Examples
+    --------
+    >>> from sthunder.database import db_select_queries as dbsq
+    >>> times, coords, totals = dbsq.select_flash_dense('2020-01-01',
+                                                        '2020-02-01')
+
+    """
+    rows = session.execute(
+        select(
+            dbs.FlashDatetime.id, dbs.FlashDatetime.datetime
+        ).where(
+            dbs.FlashDatetime.datetime >= start,
+            dbs.FlashDatetime.datetime < end
+        ).order_by(dbs.FlashDatetime.datetime)
+    ).all()
+    time_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    times = np.array([row[1] for row in rows], dtype='datetime64[s]')
+
+    filter_coords = coord_ids is not None
+    if not filter_coords:
+        coord_ids = session.execute(
+            select(dbs.FlashCoordinate.id).order_by(dbs.FlashCoordinate.id)
+        ).scalars().all()
+    coord_ids = np.asarray(coord_ids, dtype=np.int64)
+
+    totals = np.zeros((len(time_ids), len(coord_ids)), dtype=np.int64)
+    if not len(time_ids) or not len(coord_ids):
+        return times, coord_ids, totals
+
+    query = select(
+        dbs.FlashSpatioTemporal.time, dbs.FlashSpatioTemporal.coords,
+        dbs.FlashSpatioTemporal.total
+    ).where(
+        dbs.FlashSpatioTemporal.time.in_(time_ids.tolist()),
+        dbs.FlashSpatioTemporal.total != 0
+    )
+    if filter_coords:
+        query = query.where(
+            dbs.FlashSpatioTemporal.coords.in_(coord_ids.tolist())
+        )
+    facts = np.array(session.execute(query).all(), dtype=np.int64)
+    if not len(facts):
+        return times, coord_ids, totals
+
+    time_order = np.argsort(time_ids)
+    coord_order = np.argsort(coord_ids)
+    it = time_order[np.searchsorted(time_ids, facts[:, 0],
+                                    sorter=time_order)]
+    ic = coord_order[np.minimum(
+        np.searchsorted(coord_ids, facts[:, 1], sorter=coord_order),
+        len(coord_ids) - 1
+    )]
+    keep = coord_ids[ic] == facts[:, 1]
+    np.add.at(totals, (it[keep], ic[keep]), facts[keep, 2])
+
+    return times, coord_ids, totals
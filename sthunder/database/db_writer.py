@@ -0,0 +1,121 @@
+"""
+Batch writer (:mod: `sthunder.database.db_writer`)
+
+This module provides a unit-of-work writer that buffers inserts of any
+schema entity and flushes them with one multi-row statement per entity,
+instead of one session and commit per row.
+"""
+
+import time as tm
+from collections import defaultdict
+from sqlalchemy import insert
+from sthunder.database.Database import Database
+
+
+class BatchWriter:
+    """
+    BatchWriter(db=None, batch_size=1000, flush_interval=30.0)
+
+    Buffer inserts and write them in batches through a single session.
+
+    The buffer is flushed, and the transaction committed, when it holds
+    `batch_size` rows, when `flush_interval` seconds passed since the last
+    flush, and when the context exits without error. An error inside the
+    context rolls back the rows of the current batch.
+
+    Parameters
+    ----------
+    db : sthunder.database.Database, optional
+        Database holding the session. The default is None, which opens a
+        new one and closes it on exit.
+    batch_size : int, optional
+        Number of buffered rows that triggers a flush. The default is 1000.
+    flush_interval : float, optional
+        Seconds after which a flush is triggered by the next `add`. The
+        default is 30.0. None disables time-based flushes.
+
+    Examples
+    --------
+    >>> from sthunder.database import db_schema as dbs
+    >>> from sthunder.database.db_writer import BatchWriter
+    >>> with BatchWriter(batch_size=500) as writer:
+    ...     writer.add(dbs.State, name='Acre', country=3, uf='AC', geom=wkt)
+
+    """
+
+    def __init__(self, db=None, batch_size=1000, flush_interval=30.0):
+        self._own_db = db is None
+        self.db = db or Database()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = defaultdict(list)
+        self.nbuffered = 0
+        self.nwritten = 0
+        self.last_flush = tm.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                self.db.session.rollback()
+        finally:
+            if self._own_db:
+                self.db.close()
+
+        return False
+
+    def add(self, entity, **values):
+        """
+        add(entity, **values)
+
+        Buffer one row of the mapped class `entity`, e.g. `dbs.City`.
+        """
+        self.buffer[entity].append(values)
+        self.nbuffered += 1
+
+        if self.nbuffered >= self.batch_size or (
+                self.flush_interval is not None and
+                tm.perf_counter() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def add_all(self, entity, rows):
+        """
+        add_all(entity, rows)
+
+        Buffer every dict of `rows` as a row of `entity`.
+        """
+        for values in rows:
+            self.add(entity, **values)
+
+    def flush(self):
+        """
+        Write every buffered row and commit.
+
+        Returns
+        -------
+        int
+            Number of rows written.
+
+        """
+        session = self.db.session
+        nrows = self.nbuffered
+        try:
+            for entity, rows in self.buffer.items():
+                if rows:
+                    session.execute(insert(entity), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.buffer.clear()
+            self.nbuffered = 0
+            self.last_flush = tm.perf_counter()
+
+        self.nwritten += nrows
+
+        return nrows
@@ -0,0 +1,8 @@
+from .glm_reader import *
+from .glm_accumulation import *
+from .glm_prefix import *
+from .glm_zonal import *
+from .glm_store import *
+from .glm_cube import *
+from .glm_incremental import *
+from .glm_pyramid import *
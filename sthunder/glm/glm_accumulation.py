@@ -0,0 +1,248 @@
+"""
+GLM accumulation (:mod: `sthunder.glm.glm_accumulation`)
+
+This module provides a per-day, per-cell totals cube built in a single scan
+of the GLM hourly files. The cube is persisted as memory-mappable `.npy`
+files, and annual, monthly, seasonal or arbitrary-window maps are derived
+from it without reading the NetCDF files again.
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+from sthunder import constants as const
+from sthunder.helpers.masked_reductions import masked_sum
+from sthunder.glm import glm_reader
+
+
+SOURCES = 'sources.json'
+
+
+def files_signature(filenames):
+    """
+    files_signature(filenames)
+
+    Return the absolute path, size and modification time of every file,
+    sorted by path, identifying the source files of a cube.
+    """
+    signature = []
+    for filename in sorted(os.path.abspath(f) for f in filenames):
+        stat = os.stat(filename)
+        signature.append([filename, stat.st_size, stat.st_mtime_ns])
+
+    return signature
+
+
+def read_sources(path):
+    """
+    read_sources(path)
+
+    Return the signature of the source files saved with the cube in
+    directory `path`, or None if it was saved without it.
+    """
+    filename = os.path.join(path, SOURCES)
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as file:
+        return json.load(file)
+
+
+class DailyCube:
+    """
+    DailyCube(days, lons, lats, totals, hours)
+
+    Daily flash totals of every grid cell.
+
+    Parameters
+    ----------
+    days : numpy.ndarray
+        Consecutive days, numpy.datetime64[D] with shape (nday,).
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    totals : numpy.ndarray
+        Daily totals, float32 with shape (nday, nlat, nlon).
+    hours : numpy.ndarray
+        Number of hourly fields accumulated in each day, shape (nday,).
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> cube = glm.get_daily_cube()
+    >>> annual = cube.annual(2020)
+    >>> summer = cube.seasonal(2020, 4)
+
+    """
+
+    FILES = ('days', 'lons', 'lats', 'totals', 'hours')
+
+    def __init__(self, days, lons, lats, totals, hours):
+        self.days = days
+        self.lons = lons
+        self.lats = lats
+        self.totals = totals
+        self.hours = hours
+
+    def window(self, start, end, mask=None):
+        """
+        window(start, end, mask=None)
+
+        Return the totals of the days in [start, end), shape (nlat, nlon).
+        With a boolean grid `mask`, only the masked cells are summed and
+        the others are 0.
+        """
+        i0, i1 = np.searchsorted(self.days, [np.datetime64(start, 'D'),
+                                             np.datetime64(end, 'D')])
+        if mask is not None:
+            return masked_sum(self.totals[i0:i1], mask, fill=0)
+
+        return self.totals[i0:i1].sum(axis=0, dtype=np.float64)
+
+    def annual(self, year, mask=None):
+        return self.window(f"{year}-01-01", f"{year + 1}-01-01", mask)
+
+    def monthly(self, year, month, mask=None):
+        start = np.datetime64(f"{year}-{str(month).zfill(2)}", 'M')
+        return self.window(start, start + 1, mask)
+
+    def seasonal(self, year, season, mask=None):
+        """
+        seasonal(year, season)
+
+        Return the totals of a season of `const.SEASONAL_WINDOWS` within the
+        calendar year, so the season crossing the new year (summer) is made
+        of its beginning and end windows of `year`.
+        """
+        (m0, d0), (m1, d1) = const.SEASONAL_WINDOWS[season]
+        start = np.datetime64(f"{year}-{str(m0).zfill(2)}-{str(d0).zfill(2)}")
+        end = np.datetime64(f"{year}-{str(m1).zfill(2)}-{str(d1).zfill(2)}")
+        if start < end:
+            return self.window(start, end, mask)
+
+        return (self.window(f"{year}-01-01", end, mask) +
+                self.window(start, f"{year + 1}-01-01", mask))
+
+    def save(self, path, sources=None):
+        """
+        Save the cube as one `.npy` file per array in directory `path`,
+        with the `files_signature` of its source files if given.
+        """
+        tmp = f"{path}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in self.FILES:
+            np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+        if sources is not None:
+            with open(os.path.join(tmp, SOURCES), 'w') as file:
+                json.dump(sources, file)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a cube saved by `save`, memory-mapping the totals by default.
+        """
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"),
+                                mmap_mode=mmap_mode if name == 'totals'
+                                else None)
+                  for name in cls.FILES}
+
+        return cls(**arrays)
+
+
+def accumulate_daily(filename, days, totals, hours, block_size=168):
+    """
+    accumulate_daily(filename, days, totals, hours, block_size=168)
+
+    Add the hourly fields of `filename` to the daily `totals` and `hours`
+    arrays, in place, reading one block of hours at a time.
+    """
+    for times, block in glm_reader.iter_time_blocks(filename, block_size):
+        idx = np.searchsorted(days, times.astype('datetime64[D]'))
+        starts = np.nonzero(np.r_[True, idx[1:] != idx[:-1]])[0]
+        np.add.at(totals, idx[starts],
+                  np.add.reduceat(np.nan_to_num(block), starts, axis=0))
+        np.add.at(hours, idx[starts], np.diff(np.r_[starts, len(idx)]))
+
+
+def build_daily_cube(filenames=None, block_size=168):
+    """
+    build_daily_cube(filenames=None, block_size=168)
+
+    Scan the GLM files once and accumulate their daily totals.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files on the same grid. The default is None, every file
+        of `const.DIR_GLM_FILES`.
+    block_size : int, optional
+        Number of hours read at a time. The default is 168.
+
+    Returns
+    -------
+    DailyCube
+        The daily totals cube.
+
+    """
+    filenames = filenames or glm_reader.list_glm_files()
+
+    lons, lats, dmin, dmax = None, None, None, None
+    for filename in filenames:
+        lons, lats, times = glm_reader.read_axes(filename)
+        days = times.astype('datetime64[D]')
+        dmin = days.min() if dmin is None else min(dmin, days.min())
+        dmax = days.max() if dmax is None else max(dmax, days.max())
+
+    days = np.arange(dmin, dmax + 1)
+    totals = np.zeros((len(days), len(lats), len(lons)), dtype=np.float32)
+    hours = np.zeros(len(days), dtype=np.int32)
+
+    for filename in filenames:
+        print(f"accumulating {filename}")
+        accumulate_daily(filename, days, totals, hours, block_size)
+
+    return DailyCube(days, lons, lats, totals, hours)
+
+
+def get_daily_cube(filenames=None, cache_dir=const.DIR_CACHE, rebuild=False):
+    """
+    get_daily_cube(filenames=None, cache_dir=const.DIR_CACHE, rebuild=False)
+
+    Return the daily cube persisted in `cache_dir`, building and saving it
+    first if needed. The persisted cube is rebuilt if it was built from
+    other files, or files modified since.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files. The default is None, every file of
+        `const.DIR_GLM_FILES`.
+    cache_dir : str, optional
+        Cache directory. The default is `const.DIR_CACHE`.
+    rebuild : bool, optional
+        If the cube must be rebuilt even if persisted. The default is
+        False.
+
+    Returns
+    -------
+    DailyCube
+        The daily totals cube.
+
+    """
+    filenames = filenames or glm_reader.list_glm_files()
+    sources = files_signature(filenames)
+
+    path = os.path.join(cache_dir, 'daily_cube')
+    if (not rebuild and os.path.exists(os.path.join(path, 'totals.npy')) and
+            read_sources(path) == sources):
+        return DailyCube.load(path)
+
+    cube = build_daily_cube(filenames)
+    cube.save(path, sources)
+
+    return DailyCube.load(path)
@@ -0,0 +1,277 @@
+"""
+GLM hourly cube (:mod: `sthunder.glm.glm_cube`)
+
+This module provides a native on-disk format for the GLM hourly 0.5° data.
+A `.cube` file is a small JSON header holding the dtype, shape and axes,
+followed by the raw (time, lat, lon) array aligned to a page boundary. The
+array is memory-mapped, so any time or space slice is a zero-copy NumPy view
+of the file instead of newly decoded NetCDF data.
+
+The cube is written once from the `G05GT1H` NetCDF files with
+`convert_glm_files`.
+"""
+
+import os
+import json
+import numpy as np
+from sthunder import constants as const
+from sthunder.glm import glm_reader
+
+
+MAGIC = b'STHCUBE1'
+ALIGNMENT = 4096
+
+
+class HourlyCube:
+    """
+    HourlyCube(times, lons, lats, data)
+
+    Hourly flash totals of every grid cell.
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        Sorted hours, numpy.datetime64[s] with shape (nt,).
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    data : numpy.ndarray
+        Totals with shape (nt, nlat, nlon), usually a numpy.memmap.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> cube = glm.HourlyCube.open(path)
+    >>> view = cube.sel('2020-03-20', '2020-06-21', const.BBOX_BRAZIL)
+
+    """
+
+    def __init__(self, times, lons, lats, data):
+        self.times = times
+        self.lons = lons
+        self.lats = lats
+        self.data = data
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def time_slice(self, start=None, end=None):
+        """
+        time_slice(start=None, end=None)
+
+        Return the positional slice of the hours in [start, end).
+        """
+        i0 = 0 if start is None else np.searchsorted(
+            self.times, np.datetime64(start, 's'))
+        i1 = len(self.times) if end is None else np.searchsorted(
+            self.times, np.datetime64(end, 's'))
+
+        return slice(int(i0), int(i1))
+
+    def sel(self, start=None, end=None, bbox=None):
+        """
+        sel(start=None, end=None, bbox=None)
+
+        Return the hours in [start, end) of the cells inside `bbox` (lon_min,
+        lat_min, lon_max, lat_max) as a view of the cube, with its axes.
+
+        Returns
+        -------
+        HourlyCube
+            The selected cube, sharing memory with this one.
+
+        """
+        tslice = self.time_slice(start, end)
+        lat_slice, lon_slice = (slice(None), slice(None)) if bbox is None \
+            else glm_reader.bbox_slices(self.lons, self.lats, bbox)
+
+        return HourlyCube(self.times[tslice], self.lons[lon_slice],
+                          self.lats[lat_slice],
+                          self.data[tslice, lat_slice, lon_slice])
+
+    def iter_time_blocks(self, block_size=168):
+        """
+        iter_time_blocks(block_size=168)
+
+        Iterate over views of blocks of consecutive hours, as
+        `glm_reader.iter_time_blocks` does over a NetCDF file.
+        """
+        for start in range(0, len(self.times), block_size):
+            yield (self.times[start:start + block_size],
+                   self.data[start:start + block_size])
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """
+        open(path, mode='r')
+
+        Memory-map a `.cube` file. Use mode 'r+' to modify it in place.
+        """
+        header, offset = read_header(path)
+        data = np.memmap(path, dtype=header['dtype'], mode=mode,
+                         offset=offset, shape=tuple(header['shape']))
+
+        return cls(header_times(header), np.array(header['lons']),
+                   np.array(header['lats']), data)
+
+
+def read_header(path):
+    """
+    read_header(path)
+
+    Return the header dict of a `.cube` file and the offset of its data.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a sthunder cube file")
+        size = int(np.frombuffer(file.read(8), dtype='<u8')[0])
+        header = json.loads(file.read(size).decode())
+
+    return header, header['offset']
+
+
+def header_times(header):
+    """
+    header_times(header)
+
+    Return the time axis of a cube header, stored either as a start and a
+    step in seconds when regular or as the list of its instants.
+    """
+    if 'times' in header:
+        return np.array(header['times'], dtype='datetime64[s]')
+
+    return (np.datetime64(header['time_start'], 's') +
+            np.arange(header['shape'][0]) *
+            np.timedelta64(header['time_step'], 's'))
+
+
+def create_cube(path, times, lons, lats, dtype=np.float32):
+    """
+    create_cube(path, times, lons, lats, dtype=np.float32)
+
+    Create a zero-filled `.cube` file for the given axes and return it
+    memory-mapped for writing.
+    """
+    times = np.asarray(times).astype('datetime64[s]')
+    header = {
+        'dtype': np.dtype(dtype).str,
+        'shape': [len(times), len(lats), len(lons)],
+        'lons': np.asarray(lons, dtype=np.float64).tolist(),
+        'lats': np.asarray(lats, dtype=np.float64).tolist(),
+    }
+    steps = np.unique(np.diff(times).astype(np.int64))
+    if len(times) and len(steps) <= 1:
+        header['time_start'] = int(times[0].astype(np.int64))
+        header['time_step'] = int(steps[0]) if len(steps) else 3600
+    else:
+        header['times'] = times.astype(np.int64).tolist()
+
+    # The offset is part of the header, so its length is fixed first.
+    header['offset'] = 0
+    size = len(json.dumps(header).encode()) + 32
+    offset = -(-(len(MAGIC) + 8 + size) // ALIGNMENT) * ALIGNMENT
+    header['offset'] = offset
+    encoded = json.dumps(header).encode().ljust(size)
+
+    nbytes = offset + np.dtype(dtype).itemsize * int(np.prod(header['shape']))
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.array([size], dtype='<u8').tobytes())
+        file.write(encoded)
+        file.truncate(nbytes)
+
+    return HourlyCube.open(path, mode='r+')
+
+
+def convert_glm_files(path, filenames=None, bbox=None, dtype=np.float32,
+                      block_size=168):
+    """
+    convert_glm_files(path, filenames=None, bbox=None, dtype=np.float32,
+                      block_size=168)
+
+    Convert GLM hourly NetCDF files into a single `.cube` file. Missing
+    values are stored as 0.
+
+    Parameters
+    ----------
+    path : str
+        Cube file.
+    filenames : list, optional
+        GLM hourly files on the same grid, in chronological order. The
+        default is None, every file of `const.DIR_GLM_FILES`.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset, e.g.
+        `const.BBOX_BRAZIL`. The default is None, the whole grid.
+    dtype : numpy.dtype, optional
+        Stored dtype. The default is numpy.float32.
+    block_size : int, optional
+        Number of hours read at a time. The default is 168.
+
+    Returns
+    -------
+    HourlyCube
+        The converted cube, memory-mapped read-only.
+
+    """
+    filenames = filenames or glm_reader.list_glm_files()
+
+    axes = [glm_reader.read_axes(filename, bbox) for filename in filenames]
+    lons, lats = axes[0][0], axes[0][1]
+    times = np.concatenate([t for _, _, t in axes])
+    if np.any(np.diff(times) <= np.timedelta64(0)):
+        raise ValueError("GLM files must be given in chronological order "
+                         "without overlapping hours")
+
+    tmp = f"{path}.tmp"
+    cube = create_cube(tmp, times, lons, lats, dtype)
+    pos = 0
+    for filename in filenames:
+        print(f"converting {filename}")
+        for _, block in glm_reader.iter_time_blocks(filename, block_size,
+                                                    bbox=bbox):
+            cube.data[pos:pos + len(block)] = np.nan_to_num(block)
+            pos += len(block)
+
+    cube.data.flush()
+    del cube
+
+    os.replace(tmp, path)
+
+    return HourlyCube.open(path)
+
+
+def get_hourly_cube(filenames=None, path=None, bbox=None, rebuild=False):
+    """
+    get_hourly_cube(filenames=None, path=None, bbox=None, rebuild=False)
+
+    Return the hourly cube persisted in `path`, converting the GLM files
+    first if needed.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files. The default is None, every file of
+        `const.DIR_GLM_FILES`.
+    path : str, optional
+        Cube file. The default is None, `hourly.cube` of
+        `const.DIR_CACHE`.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset converted. The default
+        is None, the whole grid.
+    rebuild : bool, optional
+        If the cube must be converted even if persisted. The default is
+        False.
+
+    Returns
+    -------
+    HourlyCube
+        The hourly cube, memory-mapped read-only.
+
+    """
+    path = path or os.path.join(const.DIR_CACHE, 'hourly.cube')
+    if not rebuild and os.path.exists(path):
+        return HourlyCube.open(path)
+
+    return convert_glm_files(path, filenames, bbox)
@@ -0,0 +1,398 @@
+"""
+Incremental aggregates (:mod: `sthunder.glm.glm_incremental`)
+
+This module provides an incremental mode for the aggregates derived from
+the GLM files: the daily cube behind the annual, monthly and seasonal maps,
+and the per-city and per-state series stores. A JSON manifest records the
+checksum and day range of every file folded into each aggregate, and the
+outputs produced from each period. When a month arrives or a file changes,
+only that file is folded in, only the days and month partitions it covers
+are recomputed, and only the outputs of the periods it touches are marked
+stale.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from sthunder import constants as const
+from sthunder.glm import glm_accumulation, glm_reader, glm_store
+
+
+def file_checksum(filename, chunk_size=1 << 20):
+    """
+    file_checksum(filename, chunk_size=1 << 20)
+
+    Return the SHA-1 of the content of `filename`.
+    """
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def manifest_path(cache_dir=const.DIR_CACHE):
+    return os.path.join(cache_dir, 'manifest.json')
+
+
+def read_manifest(path):
+    """
+    read_manifest(path)
+
+    Return the manifest dict, or an empty one if `path` does not exist. Its
+    keys are 'files', the entry of every file seen, 'aggregates', the
+    files absorbed by each aggregate, keyed by its path relative to the
+    cache directory, 'outputs', the periods of every registered output, and
+    'stale', the outputs whose periods changed since they were registered.
+    """
+    if not os.path.exists(path):
+        return {'files': {}, 'aggregates': {}, 'outputs': {}, 'stale': []}
+
+    with open(path) as file:
+        manifest = json.load(file)
+
+    manifest.setdefault('aggregates', {})
+    manifest.setdefault('stale', [])
+    # Manifests of earlier versions keyed the outputs by period.
+    outputs = {}
+    for key, values in manifest.get('outputs', {}).items():
+        if key.split('/')[0] in ('annual', 'monthly', 'seasonal'):
+            for path in values:
+                outputs.setdefault(path, []).append(key)
+        else:
+            outputs[key] = values
+    manifest['outputs'] = outputs
+
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """
+    write_manifest(path, manifest)
+
+    Atomically replace the manifest.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def file_entry(filename, previous=None):
+    """
+    file_entry(filename, previous=None)
+
+    Return the manifest entry of `filename`. The checksum of the previous
+    entry is reused when the size and modification time did not change.
+    """
+    stat = os.stat(filename)
+    if (previous is not None and previous['size'] == stat.st_size and
+            previous['mtime_ns'] == stat.st_mtime_ns):
+        return previous
+
+    _, _, times = glm_reader.read_axes(filename)
+    days = times.astype('datetime64[D]')
+
+    return {'sha1': file_checksum(filename), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'first_day': str(days.min()), 'last_day': str(days.max())}
+
+
+def changed_files(filenames, manifest):
+    """
+    changed_files(filenames, manifest)
+
+    Compare `filenames` with the manifest.
+
+    Returns
+    -------
+    tuple
+        Dict of the new manifest entry of every file, and the list of files
+        new or changed since the manifest was written.
+
+    """
+    entries, changed = {}, []
+    for filename in filenames:
+        key = os.path.abspath(filename)
+        previous = manifest['files'].get(key)
+        entries[key] = file_entry(filename, previous)
+        if previous is None or previous['sha1'] != entries[key]['sha1']:
+            changed.append(filename)
+
+    return entries, changed
+
+
+def entry_days(entry):
+    return np.arange(np.datetime64(entry['first_day'], 'D'),
+                     np.datetime64(entry['last_day'], 'D') + 1)
+
+
+def affected_periods(days):
+    """
+    affected_periods(days)
+
+    Return the sorted keys of the annual ('annual/YYYY'), monthly
+    ('monthly/YYYY-MM') and seasonal ('seasonal/YYYY-S') aggregates
+    containing any of `days`. Seasons follow `DailyCube.seasonal`, within
+    the calendar year.
+    """
+    days = np.unique(np.asarray(days, dtype='datetime64[D]'))
+    periods = set()
+    for day in days:
+        year = day.astype('datetime64[Y]').astype(int) + 1970
+        periods.add(f"annual/{year}")
+        periods.add(f"monthly/{day.astype('datetime64[M]')}")
+        for season, ((m0, d0), (m1, d1)) in const.SEASONAL_WINDOWS.items():
+            start = np.datetime64(f"{year}-{m0:02d}-{d0:02d}")
+            end = np.datetime64(f"{year}-{m1:02d}-{d1:02d}")
+            inside = (start <= day < end) if start < end \
+                else (day < end or day >= start)
+            if inside:
+                periods.add(f"seasonal/{year}-{season}")
+
+    return sorted(periods)
+
+
+def register_output(path, periods, cache_dir=const.DIR_CACHE):
+    """
+    register_output(path, periods, cache_dir=const.DIR_CACHE)
+
+    Record that the output file `path` was produced from the aggregates
+    `periods`, e.g. ['seasonal/2020-1', 'seasonal/2020-2'], every period
+    the output shows and only those. The output becomes stale when a file
+    of any of these periods changes, until it is registered again.
+    """
+    if isinstance(periods, str):
+        periods = [periods]
+
+    mpath = manifest_path(cache_dir)
+    manifest = read_manifest(mpath)
+    path = os.path.abspath(path)
+    manifest['outputs'][path] = sorted(set(periods))
+    manifest['stale'] = [p for p in manifest['stale'] if p != path]
+    write_manifest(mpath, manifest)
+
+
+def invalidate_outputs(manifest, periods):
+    """
+    invalidate_outputs(manifest, periods)
+
+    Mark as stale the outputs registered for any of `periods`. The output
+    files are kept.
+
+    Returns
+    -------
+    list
+        Paths of the outputs that became stale.
+
+    """
+    periods = set(periods)
+    stale = sorted(path for path, registered in manifest['outputs'].items()
+                   if periods.intersection(registered) and
+                   path not in manifest['stale'])
+    manifest['stale'] = sorted(manifest['stale'] + stale)
+
+    return stale
+
+
+def stale_outputs(cache_dir=const.DIR_CACHE):
+    """
+    stale_outputs(cache_dir=const.DIR_CACHE)
+
+    Return the paths of the registered outputs that are stale.
+    """
+    return read_manifest(manifest_path(cache_dir))['stale']
+
+
+def absorbed_record(entries):
+    """
+    absorbed_record(entries)
+
+    Return the record of the files absorbed by an aggregate: the checksum
+    and day range of every entry.
+    """
+    return {key: {field: entry[field]
+                  for field in ('sha1', 'first_day', 'last_day')}
+            for key, entry in entries.items()}
+
+
+def aggregate_changes(entries, absorbed):
+    """
+    aggregate_changes(entries, absorbed)
+
+    Compare the current file `entries` with the files `absorbed` by an
+    aggregate.
+
+    Returns
+    -------
+    tuple
+        Files new or changed since the aggregate absorbed them, files it
+        absorbed that were removed, and the days to recompute: those of the
+        changed files, before and after the change, and of the removed
+        files.
+
+    """
+    changed = [key for key, entry in entries.items()
+               if absorbed.get(key, {}).get('sha1') != entry['sha1']]
+    removed = [key for key in absorbed if key not in entries]
+    days = [entry_days(entries[key]) for key in changed] + \
+        [entry_days(absorbed[key]) for key in changed + removed
+         if key in absorbed]
+
+    return changed, removed, np.unique(np.concatenate(
+        days + [np.array([], dtype='datetime64[D]')]
+    ))
+
+
+def update_daily_cube(path, entries, fold, reset_days, block_size=168):
+    """
+    update_daily_cube(path, entries, fold, reset_days, block_size=168)
+
+    Zero the `reset_days` of the daily cube in directory `path`, extending
+    it to the days of every entry, and accumulate the files `fold` again.
+    The files of `entries` are saved as the sources of the cube.
+    """
+    first = min(np.datetime64(e['first_day'], 'D') for e in entries.values())
+    last = max(np.datetime64(e['last_day'], 'D') for e in entries.values())
+
+    if os.path.exists(os.path.join(path, 'totals.npy')):
+        cube = glm_accumulation.DailyCube.load(path)
+        first, last = min(first, cube.days[0]), max(last, cube.days[-1])
+        lons, lats = cube.lons, cube.lats
+    else:
+        cube = None
+        lons, lats, _ = glm_reader.read_axes(fold[0])
+
+    days = np.arange(first, last + 1)
+    totals = np.zeros((len(days), len(lats), len(lons)), dtype=np.float32)
+    hours = np.zeros(len(days), dtype=np.int32)
+    if cube is not None:
+        i0 = np.searchsorted(days, cube.days[0])
+        totals[i0:i0 + len(cube.days)] = cube.totals
+        hours[i0:i0 + len(cube.days)] = cube.hours
+        del cube
+
+    reset = np.isin(days, reset_days)
+    totals[reset] = 0
+    hours[reset] = 0
+
+    for filename in fold:
+        print(f"accumulating {filename}")
+        glm_accumulation.accumulate_daily(filename, days, totals, hours,
+                                          block_size)
+
+    glm_accumulation.DailyCube(days, lons, lats, totals, hours).save(
+        path, glm_accumulation.files_signature(entries)
+    )
+
+
+def update_aggregates(filenames=None, cache_dir=const.DIR_CACHE,
+                      series=((const.SHP_BRAZIL_CITIES, 'nome'),
+                              (const.SHP_BRAZIL_STATES, 'nome'))):
+    """
+    update_aggregates(filenames=None, cache_dir=const.DIR_CACHE,
+                      series=((const.SHP_BRAZIL_CITIES, 'nome'),
+                              (const.SHP_BRAZIL_STATES, 'nome')))
+
+    Fold new or changed GLM files into the daily cube and the series
+    stores, and mark stale the outputs of the periods they touch. Each
+    aggregate tracks the files it absorbed, so stores left out of `series`
+    catch up on a later call.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files. The default is None, every file of
+        `const.DIR_GLM_FILES`.
+    cache_dir : str, optional
+        Directory of the manifest, the daily cube and the series stores.
+        The default is `const.DIR_CACHE`.
+    series : tuple, optional
+        (shapefile, column) pairs of the series stores to update. The
+        default is the cities and the states of Brazil.
+
+    Returns
+    -------
+    dict
+        'files', the files folded in, 'periods', the aggregates affected,
+        and 'stale', the registered outputs that became stale.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> glm.update_aggregates()
+    {'files': ['/glm/G05GT1H/GLM_2021_01_hourly_05x05.nc'], ...}
+
+    """
+    filenames = filenames or glm_reader.list_glm_files()
+    mpath = manifest_path(cache_dir)
+    manifest = read_manifest(mpath)
+
+    entries, _ = changed_files(filenames, manifest)
+    aggregates = manifest.setdefault('aggregates', {})
+    files, days = set(), []
+
+    cube_path = os.path.join(cache_dir, 'daily_cube')
+    name = os.path.relpath(cube_path, cache_dir)
+    absorbed = aggregates.get(name, {}) \
+        if os.path.exists(os.path.join(cube_path, 'totals.npy')) else {}
+    changed, removed, reset_days = aggregate_changes(entries, absorbed)
+    if changed or removed:
+        # Every file overlapping the reset days is folded in again.
+        fold = [f for f in filenames
+                if np.isin(entry_days(entries[os.path.abspath(f)]),
+                           reset_days).any()]
+        update_daily_cube(cube_path, entries, fold, reset_days)
+        files.update(changed + removed)
+        days.append(reset_days)
+    aggregates[name] = absorbed_record(entries)
+
+    for shapefile, column in series:
+        path = glm_store.series_store_path(shapefile, column, cache_dir)
+        name = os.path.relpath(path, cache_dir)
+        absorbed = aggregates.get(name, {}) if os.path.exists(path) else {}
+        changed, removed, reset_days = aggregate_changes(entries, absorbed)
+        if not changed and not removed:
+            continue
+        files.update(changed + removed)
+        days.append(reset_days)
+        aggregates[name] = absorbed_record(entries)
+
+        if not os.path.exists(path):
+            glm_store.write_series_store(
+                glm_store.compute_series(filenames, shapefile, column), path
+            )
+            continue
+
+        # Month partitions are replaced whole, so every file of the months
+        # of the reset days is needed.
+        months = np.unique(reset_days.astype('datetime64[M]'))
+        needed = [f for f in filenames
+                  if np.isin(entry_days(entries[os.path.abspath(f)])
+                             .astype('datetime64[M]'), months).any()]
+        if needed:
+            glm_store.update_series_store(
+                glm_store.compute_series(needed, shapefile, column), path
+            )
+
+        # Months left without any file, after removals, are dropped.
+        covered = np.concatenate(
+            [entry_days(entry).astype('datetime64[M]')
+             for entry in entries.values()] +
+            [np.array([], dtype='datetime64[M]')]
+        )
+        glm_store.delete_series_months(
+            path, months[~np.isin(months, covered)].astype(str)
+        )
+
+    periods = affected_periods(np.concatenate(
+        days + [np.array([], dtype='datetime64[D]')]
+    ))
+    stale = invalidate_outputs(manifest, periods)
+
+    manifest['files'] = entries
+    write_manifest(mpath, manifest)
+
+    return {'files': sorted(files), 'periods': periods, 'stale': stale}
@@ -0,0 +1,229 @@
+"""
+GLM prefix sums (:mod: `sthunder.glm.glm_prefix`)
+
+This module provides a cumulative-sum index over the hourly time axis of
+every grid cell of the GLM files. With `cumsum[k]` the total of the hours
+before `k`, the total of any [t0, t1) window, a season, a 10-day period or
+a storm, is `cumsum[i1] - cumsum[i0]`: two lookups per cell, whatever the
+window length. The index is a memory-mapped `.npy` file stored next to the
+GLM files.
+"""
+
+import os
+import shutil
+import numpy as np
+from sthunder import constants as const
+from sthunder.glm import glm_reader
+
+
+class PrefixIndex:
+    """
+    PrefixIndex(times, lons, lats, cumsum)
+
+    Hourly prefix sums of every grid cell.
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        Sorted hours, numpy.datetime64 with shape (nt,).
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    cumsum : numpy.ndarray
+        Prefix sums, float64 with shape (nt + 1, nlat, nlon), where
+        `cumsum[k]` is the total of `times[:k]`.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> index = glm.get_prefix_index()
+    >>> storm = index.window('2020-01-12T18', '2020-01-13T06')
+    >>> dekads = index.windows(starts, starts + np.timedelta64(10, 'D'))
+
+    """
+
+    FILES = ('times', 'lons', 'lats', 'cumsum')
+
+    def __init__(self, times, lons, lats, cumsum):
+        self.times = times
+        self.lons = lons
+        self.lats = lats
+        self.cumsum = cumsum
+
+    def positions(self, instants):
+        """
+        positions(instants)
+
+        Return the prefix positions of `instants`, i.e. the number of hours
+        before each of them.
+        """
+        return np.searchsorted(self.times,
+                               np.asarray(instants, dtype=self.times.dtype))
+
+    def window(self, start, end, mask=None):
+        """
+        window(start, end, mask=None)
+
+        Return the totals of the hours in [start, end), shape (nlat, nlon).
+        With a boolean grid `mask`, cells outside it are 0.
+        """
+        i0, i1 = self.positions([start, end])
+        total = self.cumsum[i1] - self.cumsum[i0]
+        if mask is not None:
+            total[~mask] = 0
+
+        return total
+
+    def windows(self, starts, ends):
+        """
+        windows(starts, ends)
+
+        Return the totals of many [start, end) windows at once, shape
+        (nwindow, nlat, nlon).
+        """
+        i0, i1 = self.positions(starts), self.positions(ends)
+
+        return self.cumsum[i1] - self.cumsum[i0]
+
+    def cell_totals(self, start, end, lats_idx, lons_idx):
+        """
+        cell_totals(start, end, lats_idx, lons_idx)
+
+        Return the totals of the hours in [start, end) of the given cells
+        only, shape (ncell,).
+        """
+        i0, i1 = self.positions([start, end])
+
+        return (self.cumsum[i1, lats_idx, lons_idx] -
+                self.cumsum[i0, lats_idx, lons_idx])
+
+    def save(self, path):
+        """
+        Save the index as one `.npy` file per array in directory `path`.
+        """
+        save_arrays(path, {name: getattr(self, name) for name in self.FILES})
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load an index saved by `save`, memory-mapping the prefix sums by
+        default.
+        """
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"),
+                                mmap_mode=mmap_mode if name == 'cumsum'
+                                else None)
+                  for name in cls.FILES}
+
+        return cls(**arrays)
+
+
+def save_arrays(path, arrays):
+    """
+    save_arrays(path, arrays)
+
+    Write `arrays`, a dict of name to array, as `.npy` files of a temporary
+    directory, then replace directory `path` with it.
+    """
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def build_prefix_index(path, filenames=None, block_size=168):
+    """
+    build_prefix_index(path, filenames=None, block_size=168)
+
+    Scan the GLM files once and write their hourly prefix sums to directory
+    `path`. The prefix sums are written block by block to a memory-mapped
+    file, so memory use does not grow with the time range.
+
+    Parameters
+    ----------
+    path : str
+        Index directory.
+    filenames : list, optional
+        GLM hourly files on the same grid, in chronological order. The
+        default is None, every file of `const.DIR_GLM_FILES`.
+    block_size : int, optional
+        Number of hours read at a time. The default is 168.
+
+    Returns
+    -------
+    PrefixIndex
+        The index, memory-mapped from `path`.
+
+    """
+    filenames = filenames or glm_reader.list_glm_files()
+
+    axes = [glm_reader.read_axes(filename) for filename in filenames]
+    lons, lats = axes[0][0], axes[0][1]
+    times = np.concatenate([t for _, _, t in axes])
+    if np.any(np.diff(times) <= np.timedelta64(0)):
+        raise ValueError("GLM files must be given in chronological order "
+                         "without overlapping hours")
+
+    tmp = f"{path}.tmp"
+    save_arrays(tmp, {'times': times, 'lons': lons, 'lats': lats})
+    cumsum = np.lib.format.open_memmap(
+        os.path.join(tmp, 'cumsum.npy'), mode='w+', dtype=np.float64,
+        shape=(len(times) + 1, len(lats), len(lons))
+    )
+
+    cumsum[0] = 0
+    pos = 0
+    for filename in filenames:
+        print(f"indexing {filename}")
+        for _, block in glm_reader.iter_time_blocks(filename, block_size):
+            block = np.cumsum(np.nan_to_num(block), axis=0, dtype=np.float64)
+            cumsum[pos + 1:pos + 1 + len(block)] = block + cumsum[pos]
+            pos += len(block)
+
+    cumsum.flush()
+    del cumsum
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+    return PrefixIndex.load(path)
+
+
+def get_prefix_index(filenames=None, path=None, rebuild=False):
+    """
+    get_prefix_index(filenames=None, path=None, rebuild=False)
+
+    Return the prefix index persisted in `path`, building it first if
+    needed.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files. The default is None, every file of
+        `const.DIR_GLM_FILES`.
+    path : str, optional
+        Index directory. The default is None, `prefix_index` next to the
+        GLM files.
+    rebuild : bool, optional
+        If the index must be rebuilt even if persisted. The default is
+        False.
+
+    Returns
+    -------
+    PrefixIndex
+        The prefix index.
+
+    """
+    if path is None:
+        directory = (os.path.dirname(filenames[0]) if filenames
+                     else const.DIR_GLM_FILES)
+        path = os.path.join(directory, 'prefix_index')
+
+    if not rebuild and os.path.exists(os.path.join(path, 'cumsum.npy')):
+        return PrefixIndex.load(path)
+
+    return build_prefix_index(path, filenames)
@@ -0,0 +1,266 @@
+"""
+GLM aggregate pyramid (:mod: `sthunder.glm.glm_pyramid`)
+
+This module provides a multi-resolution pyramid of the daily cube of
+`glm_accumulation`: the native 0.5° grid and 1°, 2° and 4° grids, each cell
+holding the totals of the cells it covers. Every level is built in the same
+scan of the base cube and persisted as a `DailyCube`, so overview maps and
+queries read and reduce a grid up to 64 times smaller than the native one.
+"""
+
+import os
+import shutil
+import numpy as np
+from sthunder import constants as const
+from sthunder.glm.glm_accumulation import DailyCube, get_daily_cube
+
+
+RESOLUTIONS = (0.5, 1., 2., 4.)
+
+
+def grid_resolution(axis):
+    return float(np.round(np.abs(np.diff(axis)).mean(), 6))
+
+
+def base_cells(cube, base=RESOLUTIONS[0]):
+    """
+    base_cells(cube, base=RESOLUTIONS[0])
+
+    Number of `base` resolution cells summed in each cell of `cube`, shape
+    (nlat, nlon), e.g. 16 for a 2° level of a 0.5° pyramid, fewer in the
+    cells padded past the edge of the base grid. Dividing the totals of a
+    level by it gives totals per base cell, comparable across levels.
+    """
+    cells = getattr(cube, 'cells', None)
+    if cells is not None:
+        return cells
+
+    return np.full((len(cube.lats), len(cube.lons)),
+                   (grid_resolution(cube.lons)/base)**2, dtype=np.float32)
+
+
+def coarsen_axis(axis, factor):
+    """
+    coarsen_axis(axis, factor)
+
+    Return the centers of the cells made of `factor` consecutive cells of
+    `axis`, extending the last one past the end of the axis if needed.
+    """
+    step = np.diff(axis).mean() if len(axis) > 1 else 0.
+    size = -(-len(axis) // factor) * factor
+    padded = axis[0] + step*np.arange(size)
+
+    return padded.reshape(-1, factor).mean(axis=1)
+
+
+def coarsen(totals, factor):
+    """
+    coarsen(totals, factor)
+
+    Sum blocks of `factor` x `factor` cells of an array with shape
+    (nt, nlat, nlon), padding the grid with zeros to a multiple of
+    `factor`.
+    """
+    nt, nlat, nlon = totals.shape
+    plat, plon = -nlat % factor, -nlon % factor
+    if plat or plon:
+        totals = np.pad(totals, ((0, 0), (0, plat), (0, plon)))
+
+    return totals.reshape(nt, (nlat + plat)//factor, factor,
+                          (nlon + plon)//factor, factor).sum(axis=(2, 4))
+
+
+class Pyramid:
+    """
+    Pyramid(levels)
+
+    Daily cubes of the same data at several grid resolutions.
+
+    Parameters
+    ----------
+    levels : dict
+        DailyCube of each resolution, in degrees.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> pyramid = glm.get_pyramid()
+    >>> overview = pyramid.annual(2020, resolution=2)
+    >>> cube = pyramid.level(1.5)  # the 1° level
+    >>> density = cube.annual(2020) / glm.base_cells(cube)
+
+    """
+
+    CELLS = 'cells.npy'
+
+    def __init__(self, levels):
+        self.levels = dict(sorted(levels.items()))
+
+    @property
+    def resolutions(self):
+        return tuple(self.levels)
+
+    def level(self, resolution=None):
+        """
+        level(resolution=None)
+
+        Return the coarsest level whose resolution is finer than or equal to
+        `resolution`, in degrees, or the finest level if `resolution` is None
+        or finer than every level.
+        """
+        fitting = [res for res in self.levels
+                   if resolution is not None and res <= resolution]
+
+        return self.levels[max(fitting) if fitting else min(self.levels)]
+
+    def window(self, start, end, resolution=None, mask=None):
+        return self.level(resolution).window(start, end, mask)
+
+    def annual(self, year, resolution=None, mask=None):
+        return self.level(resolution).annual(year, mask)
+
+    def monthly(self, year, month, resolution=None, mask=None):
+        return self.level(resolution).monthly(year, month, mask)
+
+    def seasonal(self, year, season, resolution=None, mask=None):
+        return self.level(resolution).seasonal(year, season, mask)
+
+    def save(self, path):
+        """
+        Save every level but the finest, the base cube persisted on its own,
+        as a `DailyCube` in a subdirectory of `path`, with its `base_cells`.
+        """
+        for res in self.resolutions[1:]:
+            level = os.path.join(path, str(res))
+            self.levels[res].save(level)
+            np.save(os.path.join(level, self.CELLS),
+                    base_cells(self.levels[res]))
+
+    @classmethod
+    def load(cls, path, cube, mmap_mode='r'):
+        """
+        Load the levels saved by `save` on top of the base `cube`.
+        """
+        levels = {}
+        for name in os.listdir(path):
+            if name.endswith('.tmp'):
+                continue
+            level = DailyCube.load(os.path.join(path, name), mmap_mode)
+            cells = os.path.join(path, name, cls.CELLS)
+            level.cells = np.load(cells) if os.path.exists(cells) else None
+            levels[float(name)] = level
+        levels[grid_resolution(cube.lons)] = cube
+
+        return cls(levels)
+
+
+def build_pyramid(cube, resolutions=RESOLUTIONS, block_size=31):
+    """
+    build_pyramid(cube, resolutions=RESOLUTIONS, block_size=31)
+
+    Build the levels of a pyramid from a base daily cube in a single scan of
+    its days, each level being coarsened from the previous one.
+
+    Parameters
+    ----------
+    cube : DailyCube
+        Base cube.
+    resolutions : tuple, optional
+        Resolutions of the levels, in degrees, each a multiple of the
+        previous one. The default is `RESOLUTIONS`.
+    block_size : int, optional
+        Number of days read at a time. The default is 31.
+
+    Returns
+    -------
+    Pyramid
+        The pyramid, with `cube` as its finest level.
+
+    """
+    base = grid_resolution(cube.lons)
+    resolutions = sorted(res for res in resolutions if res > base)
+    factors, previous = [], base
+    for res in resolutions:
+        factor = res/previous
+        if not np.isclose(factor, round(factor)):
+            raise ValueError(f"resolution {res} is not a multiple of "
+                             f"{previous}")
+        factors.append(int(round(factor)))
+        previous = res
+
+    # Base cells of each coarse cell, fewer in the padded edge cells.
+    cells = np.ones((1, len(cube.lats), len(cube.lons)), dtype=np.float32)
+    levels, lons, lats = [], cube.lons, cube.lats
+    for factor in factors:
+        lons, lats = coarsen_axis(lons, factor), coarsen_axis(lats, factor)
+        cells = coarsen(cells, factor)
+        levels.append((lons, lats, cells[0],
+                       np.zeros((len(cube.days), len(lats), len(lons)),
+                                dtype=np.float32)))
+
+    for start in range(0, len(cube.days), block_size):
+        block = np.asarray(cube.totals[start:start + block_size])
+        for factor, (_, _, _, totals) in zip(factors, levels):
+            block = coarsen(block, factor)
+            totals[start:start + len(block)] = block
+
+    pyramid = {base: cube}
+    for res, (lons, lats, cells, totals) in zip(resolutions, levels):
+        pyramid[res] = DailyCube(cube.days, lons, lats, totals,
+                                 cube.hours.copy())
+        pyramid[res].cells = cells
+
+    return Pyramid(pyramid)
+
+
+def get_pyramid(filenames=None, cache_dir=const.DIR_CACHE,
+                resolutions=RESOLUTIONS, rebuild=False):
+    """
+    get_pyramid(filenames=None, cache_dir=const.DIR_CACHE,
+                resolutions=RESOLUTIONS, rebuild=False)
+
+    Return the pyramid persisted in `cache_dir`, building it from the daily
+    cube (`get_daily_cube`) and saving it first if needed.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files of the daily cube. The default is None, every file
+        of `const.DIR_GLM_FILES`.
+    cache_dir : str, optional
+        Cache directory. The default is `const.DIR_CACHE`.
+    resolutions : tuple, optional
+        Resolutions of the levels, in degrees. The default is
+        `RESOLUTIONS`.
+    rebuild : bool, optional
+        If the pyramid must be rebuilt even if persisted. The default is
+        False.
+
+    Returns
+    -------
+    Pyramid
+        The pyramid.
+
+    """
+    path = os.path.join(cache_dir, 'pyramid')
+    cube = get_daily_cube(filenames, cache_dir=cache_dir)
+
+    # Levels older than the base cube, e.g. after `update_aggregates`, are
+    # rebuilt.
+    base = os.path.getmtime(os.path.join(cache_dir, 'daily_cube',
+                                         'totals.npy'))
+    if not rebuild and os.path.exists(path):
+        pyramid = Pyramid.load(path, cube)
+        mtimes = [os.path.getmtime(os.path.join(path, name, 'totals.npy'))
+                  for name in os.listdir(path) if not name.endswith('.tmp')]
+        # Levels saved without their base cells are rebuilt too.
+        if (set(pyramid.resolutions) == set(resolutions) and
+                min(mtimes, default=0) >= base and
+                all(getattr(level, 'cells', 0) is not None
+                    for level in pyramid.levels.values())):
+            return pyramid
+
+    shutil.rmtree(path, ignore_errors=True)
+    build_pyramid(cube, resolutions).save(path)
+
+    return Pyramid.load(path, cube)
@@ -0,0 +1,182 @@
+"""
+GLM files reader (:mod: `sthunder.glm.glm_reader`)
+
+This module provides lazy, chunked access to the GLM hourly 0.5° NetCDF
+files (`G05GT1H`). Files are opened without loading `var`, and data is read
+one time or space block at a time, optionally restricted to a bounding box,
+so peak memory does not grow with the time range.
+"""
+
+import os
+import numpy as np
+import xarray as xr
+from sthunder import constants as const
+
+
+def glm_filename(year, month, directory=const.DIR_GLM_FILES):
+    """
+    glm_filename(year, month, directory=const.DIR_GLM_FILES)
+
+    Return the path of the GLM file of a month.
+    """
+    return os.path.join(directory,
+                        f"GLM_{year}_{str(month).zfill(2)}_hourly_05x05.nc")
+
+
+def list_glm_files(directory=const.DIR_GLM_FILES):
+    """
+    list_glm_files(directory=const.DIR_GLM_FILES)
+
+    Return the sorted NetCDF files of `directory`.
+    """
+    return sorted(os.path.join(directory, file)
+                  for file in os.listdir(directory) if file.endswith('.nc'))
+
+
+def bbox_slices(lons, lats, bbox):
+    """
+    bbox_slices(lons, lats, bbox)
+
+    Return the positional lat and lon slices of the grid cells inside
+    `bbox` (lon_min, lat_min, lon_max, lat_max).
+    """
+    lon_min, lat_min, lon_max, lat_max = bbox
+    ilon = np.nonzero((lons >= lon_min) & (lons <= lon_max))[0]
+    ilat = np.nonzero((lats >= lat_min) & (lats <= lat_max))[0]
+
+    return (slice(ilat.min(), ilat.max() + 1),
+            slice(ilon.min(), ilon.max() + 1))
+
+
+def open_glm(filename, bbox=None):
+    """
+    open_glm(filename, bbox=None)
+
+    Open a GLM file lazily. Nothing but the coordinates is read until the
+    returned dataset is indexed and its values are accessed.
+
+    Parameters
+    ----------
+    filename : str
+        GLM hourly NetCDF file.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset, e.g.
+        `const.BBOX_BRAZIL`. The default is None, the whole grid.
+
+    Returns
+    -------
+    xarray.Dataset
+        The lazily opened dataset.
+
+    """
+    nc = xr.open_dataset(filename, cache=False)
+    if bbox is not None:
+        lat_slice, lon_slice = bbox_slices(nc['lon'].values,
+                                           nc['lat'].values, bbox)
+        nc = nc.isel(lat=lat_slice, lon=lon_slice)
+
+    return nc
+
+
+def read_axes(filename, bbox=None):
+    """
+    read_axes(filename, bbox=None)
+
+    Read the lon, lat and time axes of a GLM file without reading `var`.
+
+    Returns
+    -------
+    tuple
+        lons, lats and times numpy arrays.
+
+    """
+    with open_glm(filename, bbox) as nc:
+        return nc['lon'].values, nc['lat'].values, nc['time'].values
+
+
+def iter_time_blocks(filename, block_size=168, t0=None, t1=None, bbox=None,
+                     variable='var'):
+    """
+    iter_time_blocks(filename, block_size=168, t0=None, t1=None, bbox=None,
+                     variable='var')
+
+    Iterate over blocks of consecutive hours of a GLM file.
+
+    Parameters
+    ----------
+    filename : str
+        GLM hourly NetCDF file.
+    block_size : int, optional
+        Number of hours per block. The default is 168 (one week).
+    t0 : int, optional
+        Index of the first hour. The default is None, the first hour.
+    t1 : int, optional
+        Index after the last hour. The default is None, the last hour.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset. The default is None.
+    variable : str, optional
+        Variable to read. The default is 'var'.
+
+    Yields
+    ------
+    tuple
+        times numpy.ndarray with shape (nt,) and data numpy.ndarray with
+        shape (nt, nlat, nlon).
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> for times, block in glm.iter_time_blocks(filename, 24):
+    ...     total += block.sum(axis=0)
+
+    """
+    with open_glm(filename, bbox) as nc:
+        t0, t1, _ = slice(t0, t1).indices(nc.sizes['time'])
+        for start in range(t0, t1, block_size):
+            block = nc[variable].isel(
+                time=slice(start, min(start + block_size, t1))
+            )
+            yield block['time'].values, block.values
+
+
+def iter_space_blocks(filename, block_shape=(40, 40), t0=None, t1=None,
+                      bbox=None, variable='var'):
+    """
+    iter_space_blocks(filename, block_shape=(40, 40), t0=None, t1=None,
+                      bbox=None, variable='var')
+
+    Iterate over lat/lon tiles of a GLM file, each with its full (or
+    [t0, t1)) time series.
+
+    Parameters
+    ----------
+    filename : str
+        GLM hourly NetCDF file.
+    block_shape : tuple, optional
+        Number of lats and lons per tile. The default is (40, 40).
+    t0 : int, optional
+        Index of the first hour. The default is None, the first hour.
+    t1 : int, optional
+        Index after the last hour. The default is None, the last hour.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset. The default is None.
+    variable : str, optional
+        Variable to read. The default is 'var'.
+
+    Yields
+    ------
+    tuple
+        lat slice and lon slice of the tile in the (subset) grid, and data
+        numpy.ndarray with shape (nt, nlat, nlon).
+
+    """
+    with open_glm(filename, bbox) as nc:
+        var = nc[variable].isel(time=slice(t0, t1))
+        nlat, nlon = nc.sizes['lat'], nc.sizes['lon']
+        for i in range(0, nlat, block_shape[0]):
+            for j in range(0, nlon, block_shape[1]):
+                lat_slice = slice(i, min(i + block_shape[0], nlat))
+                lon_slice = slice(j, min(j + block_shape[1], nlon))
+                yield lat_slice, lon_slice, var.isel(
+                    lat=lat_slice, lon=lon_slice
+                ).values
@@ -0,0 +1,223 @@
+"""
+GLM series store (:mod: `sthunder.glm.glm_store`)
+
+This module provides a Parquet store of wide datetime x polygon series, such
+as the hourly city totals of `glm_zonal.zonal_series`. The store is
+partitioned by month, so a time range only reads the partitions it
+overlaps, and each polygon is a float32 column, so a subset of polygons
+only reads those columns. Loading is a columnar read into a ready float32
+matrix, with no text parsing, grouping or pivoting.
+"""
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sthunder import constants as const
+from sthunder.glm import glm_zonal
+
+
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]),
+                               flavor='hive')
+
+
+def series_table(df):
+    """
+    series_table(df)
+
+    Convert a wide series frame with a datetime index and unique column
+    names to the Arrow table of the store.
+    """
+    if not df.columns.is_unique:
+        raise ValueError("series columns must be unique, duplicated: "
+                         f"{list(df.columns[df.columns.duplicated()][:5])}")
+
+    arrays = [pa.array(df.index.values.astype('datetime64[us]')),
+              pa.array(df.index.strftime('%Y-%m'))]
+    arrays += [pa.array(df[name].values.astype(np.float32))
+               for name in df.columns]
+    return pa.Table.from_arrays(
+        arrays, names=['datetime', 'month'] + [str(c) for c in df.columns]
+    )
+
+
+def write_series_store(df, path):
+    """
+    write_series_store(df, path)
+
+    Write a wide series frame to a month-partitioned Parquet store in
+    directory `path`, replacing any previous store.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Series with a datetime index and unique column names.
+    path : str
+        Store directory.
+
+    """
+    table = series_table(df)
+
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    ds.write_dataset(table, tmp, format='parquet',
+                     partitioning=PARTITIONING)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def update_series_store(df, path):
+    """
+    update_series_store(df, path)
+
+    Replace the month partitions of the store in directory `path` covered
+    by `df`, leaving the other months untouched. `df` must have the columns
+    of the store.
+    """
+    ds.write_dataset(series_table(df), path, format='parquet',
+                     partitioning=PARTITIONING,
+                     basename_template='part-{i}.parquet',
+                     existing_data_behavior='delete_matching')
+
+
+def delete_series_months(path, months):
+    """
+    delete_series_months(path, months)
+
+    Delete the month partitions of the store in directory `path`, e.g. of
+    the months whose files were all removed. `months` are 'YYYY-MM'
+    strings.
+    """
+    for month in months:
+        shutil.rmtree(os.path.join(path, f"month={month}"),
+                      ignore_errors=True)
+
+
+def compute_series(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                   column='nome'):
+    """
+    compute_series(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                   column='nome')
+
+    Compute the series of the polygons of a shapefile for the store with
+    `glm_zonal.zonal_series`. Polygons sharing a name are summed into one
+    column.
+    """
+    df = glm_zonal.zonal_series(filenames, shapefile, column)
+    if not df.columns.is_unique:
+        df = df.T.groupby(level=0, sort=False).sum().T
+
+    return df
+
+
+def series_store_path(shapefile, column, cache_dir=const.DIR_CACHE):
+    name = os.path.splitext(os.path.basename(shapefile))[0]
+
+    return os.path.join(cache_dir, 'series', f"{name}_{column}")
+
+
+def read_series_store(path, columns=None, start=None, end=None):
+    """
+    read_series_store(path, columns=None, start=None, end=None)
+
+    Read a series store written by `write_series_store`.
+
+    Parameters
+    ----------
+    path : str
+        Store directory.
+    columns : list, optional
+        Columns to read. The default is None, every column.
+    start : str or numpy.datetime64, optional
+        First datetime to read. The default is None, the first one.
+    end : str or numpy.datetime64, optional
+        Datetime after the last one to read. The default is None, the last
+        one.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Float32 series with a datetime index, backed by a single
+        (ntime, ncolumn) matrix.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> df = glm.read_series_store(path, start='2020-03-20', end='2020-06-21')
+    >>> data = df.values.T
+
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+    if columns is None:
+        columns = [name for name in dataset.schema.names
+                   if name not in ('datetime', 'month')]
+
+    # Month filters prune partitions, datetime filters prune row groups.
+    condition = None
+    if start is not None:
+        start = np.datetime64(start, 'us')
+        condition = ((ds.field('month') >= str(start.astype('datetime64[M]')))
+                     & (ds.field('datetime') >= pa.scalar(start)))
+    if end is not None:
+        end = np.datetime64(end, 'us')
+        before = ((ds.field('month') <= str(end.astype('datetime64[M]')))
+                  & (ds.field('datetime') < pa.scalar(end)))
+        condition = before if condition is None else condition & before
+
+    table = dataset.to_table(columns=['datetime'] + list(columns),
+                             filter=condition)
+    table = table.sort_by('datetime')
+
+    matrix = np.empty((table.num_rows, len(columns)), dtype=np.float32)
+    for j, name in enumerate(columns):
+        matrix[:, j] = table.column(name).to_numpy()
+
+    return pd.DataFrame(
+        matrix, columns=pd.Index(columns),
+        index=pd.DatetimeIndex(table.column('datetime').to_numpy(),
+                               name='datetime'),
+        copy=False
+    )
+
+
+def get_series_store(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                     column='nome', path=None, rebuild=False, **kwargs):
+    """
+    get_series_store(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                     column='nome', path=None, rebuild=False, **kwargs)
+
+    Read the series store of the polygons of a shapefile, computing its
+    series with `compute_series` and writing it first if needed.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files. The default is None, every file of
+        `const.DIR_GLM_FILES`.
+    shapefile : str, optional
+        Shapefile path. The default is `const.SHP_BRAZIL_CITIES`.
+    column : str, optional
+        Attribute column naming the polygons. The default is 'nome'.
+    path : str, optional
+        Store directory. The default is None, a directory of
+        `const.DIR_CACHE` named after the shapefile and column.
+    rebuild : bool, optional
+        If the store must be rebuilt even if persisted. The default is
+        False.
+    **kwargs
+        Other `read_series_store` arguments.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The series read by `read_series_store`.
+
+    """
+    path = path or series_store_path(shapefile, column)
+    if rebuild or not os.path.exists(path):
+        write_series_store(compute_series(filenames, shapefile, column), path)
+
+    return read_series_store(path, **kwargs)
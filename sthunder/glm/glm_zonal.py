@@ -0,0 +1,260 @@
+"""
+GLM zonal statistics (:mod: `sthunder.glm.glm_zonal`)
+
+This module provides area-weighted zonal totals of the GLM grid over
+polygons, e.g. the municipalities or states of Brazil. The fraction of
+every grid cell covered by every polygon is computed once and stored as a
+sparse (npolygon, ncell) matrix, so the zonal totals of a block of hours
+are a single sparse matrix product.
+"""
+
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import shapely.geometry as sgeom
+from sthunder import constants as const
+from sthunder.helpers.geo_cache import read_layer
+from sthunder.glm import glm_reader
+
+try:
+    from shapely import STRtree, area, box, intersection
+except ImportError:  # shapely < 2.0
+    STRtree = None
+
+
+def cell_size(axis):
+    return np.abs(np.diff(axis).mean()) if len(axis) > 1 else 0.5
+
+
+def cell_boxes(lons, lats):
+    """
+    cell_boxes(lons, lats)
+
+    Return the boxes of the grid cells centered at `lons` and `lats`, in
+    row-major (lat, lon) order, and their common area.
+    """
+    dlon, dlat = cell_size(lons), cell_size(lats)
+    mlon, mlat = np.meshgrid(lons, lats)
+    if STRtree is None:
+        boxes = np.empty(mlon.size, dtype=object)
+        boxes[:] = [sgeom.box(x - dlon/2, y - dlat/2, x + dlon/2, y + dlat/2)
+                    for x, y in zip(mlon.ravel(), mlat.ravel())]
+    else:
+        boxes = box(mlon.ravel() - dlon/2, mlat.ravel() - dlat/2,
+                    mlon.ravel() + dlon/2, mlat.ravel() + dlat/2)
+
+    return boxes, dlon*dlat
+
+
+def intersect_cells(geoms, boxes, lons, lats):
+    """
+    intersect_cells(geoms, boxes, lons, lats)
+
+    Return the polygon and cell indices and the intersection areas of every
+    polygon with the cells of the regular grid overlapping its bounds, one
+    polygon at a time, for shapely < 2.
+    """
+    dlon, dlat = cell_size(lons), cell_size(lats)
+    ipoly, icell, areas = [], [], []
+    for i, geom in enumerate(geoms):
+        minx, miny, maxx, maxy = geom.bounds
+        ilon = np.nonzero((lons + dlon/2 > minx) & (lons - dlon/2 < maxx))[0]
+        ilat = np.nonzero((lats + dlat/2 > miny) & (lats - dlat/2 < maxy))[0]
+        for cell in (ilat[:, None]*len(lons) + ilon[None, :]).ravel():
+            ipoly.append(i)
+            icell.append(cell)
+            areas.append(geom.intersection(boxes[cell]).area)
+
+    return (np.array(ipoly, dtype=np.int64), np.array(icell, dtype=np.int64),
+            np.array(areas, dtype=np.float64))
+
+
+def compute_zonal_weights(geoms, lons, lats):
+    """
+    compute_zonal_weights(geoms, lons, lats)
+
+    Compute the fraction of every grid cell covered by every polygon.
+
+    Parameters
+    ----------
+    geoms : array_like
+        Polygon geometries, shape (npolygon,).
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Weights with shape (npolygon, nlat*nlon), cells in row-major
+        (lat, lon) order.
+
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    boxes, cell_area = cell_boxes(lons, lats)
+
+    if STRtree is not None:
+        ipoly, icell = STRtree(boxes).query(geoms, predicate='intersects')
+        weights = area(intersection(boxes[icell], geoms[ipoly])) / cell_area
+    else:
+        ipoly, icell, weights = intersect_cells(geoms, boxes, lons, lats)
+        weights = weights / cell_area
+
+    keep = weights > 0
+    return sp.csr_matrix(
+        (weights[keep], (ipoly[keep], icell[keep])),
+        shape=(len(geoms), len(boxes))
+    )
+
+
+def zonal_weights_key(lons, lats, shapefile, column):
+    """
+    zonal_weights_key(lons, lats, shapefile, column)
+
+    Hash identifying a grid definition and a set of polygons. The shapefile
+    modification time is part of the key, so editing it invalidates the
+    weights.
+    """
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(lons, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(lats, dtype=np.float64).tobytes())
+    stat = os.stat(shapefile)
+    sha.update(f"{os.path.abspath(shapefile)}|{stat.st_mtime_ns}|"
+               f"{stat.st_size}|{column}".encode())
+
+    return sha.hexdigest()
+
+
+def get_zonal_weights(lons, lats, shapefile=const.SHP_BRAZIL_CITIES,
+                      column='nome', cache_dir=const.DIR_CACHE):
+    """
+    get_zonal_weights(lons, lats, shapefile=const.SHP_BRAZIL_CITIES,
+                      column='nome', cache_dir=const.DIR_CACHE)
+
+    Return the zonal weights of the polygons of a shapefile, loading them
+    from `cache_dir` when they were already computed for the same grid.
+
+    Parameters
+    ----------
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    shapefile : str, optional
+        Shapefile path, e.g. `const.SHP_BRAZIL_CITIES` or
+        `const.SHP_BRAZIL_STATES`. The default is `const.SHP_BRAZIL_CITIES`.
+    column : str, optional
+        Attribute column naming the polygons. The default is 'nome'.
+    cache_dir : str, optional
+        Directory of the persisted weights. The default is
+        `const.DIR_CACHE`. None disables persistence.
+
+    Returns
+    -------
+    tuple
+        Polygon names numpy.ndarray with shape (npolygon,) and weights
+        scipy.sparse.csr_matrix with shape (npolygon, nlat*nlon).
+
+    """
+    path = None
+    if cache_dir is not None:
+        key = zonal_weights_key(lons, lats, shapefile, column)
+        path = os.path.join(cache_dir, 'zonal_weights', key)
+        if os.path.exists(os.path.join(path, 'weights.npz')):
+            return (np.load(os.path.join(path, 'names.npy'),
+                            allow_pickle=True),
+                    sp.load_npz(os.path.join(path, 'weights.npz')).tocsr())
+
+    gdf = read_layer(shapefile)
+    names = gdf[column].values
+    weights = compute_zonal_weights(gdf.geometry.values, lons, lats)
+
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'names.npy'), names)
+        sp.save_npz(os.path.join(path, 'weights.npz'), weights)
+
+    return names, weights
+
+
+def zonal_totals(block, weights):
+    """
+    zonal_totals(block, weights)
+
+    Return the zonal totals of a block of hours with shape
+    (nt, nlat, nlon), shape (nt, npolygon).
+    """
+    cells = np.nan_to_num(block).reshape(len(block), -1)
+
+    return np.asarray(weights @ cells.T).T
+
+
+def zonal_series(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                 column='nome', bbox=const.BBOX_BRAZIL, block_size=744,
+                 cache_dir=const.DIR_CACHE, cube=None):
+    """
+    zonal_series(filenames=None, shapefile=const.SHP_BRAZIL_CITIES,
+                 column='nome', bbox=const.BBOX_BRAZIL, block_size=744,
+                 cache_dir=const.DIR_CACHE, cube=None)
+
+    Compute the hourly, area-weighted flash totals of every polygon of a
+    shapefile.
+
+    Parameters
+    ----------
+    filenames : list, optional
+        GLM hourly files on the same grid. The default is None, every file
+        of `const.DIR_GLM_FILES`.
+    shapefile : str, optional
+        Shapefile path. The default is `const.SHP_BRAZIL_CITIES`.
+    column : str, optional
+        Attribute column naming the polygons. The default is 'nome'.
+    bbox : tuple, optional
+        (lon_min, lat_min, lon_max, lat_max) subset of the grid covering
+        the polygons. The default is `const.BBOX_BRAZIL`.
+    block_size : int, optional
+        Number of hours read at a time. The default is 744.
+    cache_dir : str, optional
+        Directory of the persisted weights. The default is
+        `const.DIR_CACHE`.
+    cube : glm_cube.HourlyCube, optional
+        Hourly cube read instead of `filenames`. The default is None.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Totals with a datetime index and one column per polygon.
+
+    Examples
+    --------
+    >>> from sthunder import glm
+    >>> cities = glm.zonal_series()
+    >>> states = glm.zonal_series(shapefile=const.SHP_BRAZIL_STATES)
+
+    """
+    if cube is not None:
+        cube = cube.sel(bbox=bbox)
+        lons, lats = cube.lons, cube.lats
+        blocks = cube.iter_time_blocks(block_size)
+    else:
+        filenames = filenames or glm_reader.list_glm_files()
+        lons, lats, _ = glm_reader.read_axes(filenames[0], bbox)
+        blocks = (block for filename in filenames
+                  for block in glm_reader.iter_time_blocks(
+                      filename, block_size, bbox=bbox))
+
+    names, weights = get_zonal_weights(lons, lats, shapefile, column,
+                                       cache_dir)
+
+    times, totals = [], []
+    for block_times, block in blocks:
+        times.append(block_times)
+        totals.append(zonal_totals(block, weights))
+
+    return pd.DataFrame(np.concatenate(totals),
+                        index=pd.DatetimeIndex(np.concatenate(times),
+                                               name='datetime'),
+                        columns=pd.Index(names, name=column))
@@ -0,0 +1,3 @@
+from .geo_cache import *
+from .grid_mask import *
+from .masked_reductions import *
@@ -0,0 +1,144 @@
+"""
+Geometry cache (:mod: `sthunder.helpers.geo_cache`)
+
+This module provides cached access to the shapefile layers of `constants`.
+Each layer is converted once to GeoParquet in EPSG:4326, optionally with
+simplified geometries for rendering, and read from there afterwards. Layers,
+selected geometries and prepared geometries are also memoized in the process,
+so repeated calls do not read the disk again.
+"""
+
+import os
+import hashlib
+import geopandas as gpd
+import shapely
+from sthunder import constants as const
+
+
+_LAYERS = {}
+_GEOMETRIES = {}
+
+
+def layer_key(shapefile, tolerance=None):
+    """
+    layer_key(shapefile, tolerance=None)
+
+    Hash identifying a shapefile layer and its simplification tolerance.
+    The shapefile modification time is part of the key, so editing it
+    invalidates the cached layer.
+    """
+    stat = os.stat(shapefile)
+
+    return hashlib.sha1(
+        f"{os.path.abspath(shapefile)}|{stat.st_mtime_ns}|{stat.st_size}|"
+        f"{tolerance}".encode()
+    ).hexdigest()
+
+
+def simplify_layer(gdf, tolerance):
+    """
+    simplify_layer(gdf, tolerance)
+
+    Simplify the geometries of a layer, keeping the boundaries shared by
+    neighbouring polygons identical when shapely supports coverages
+    (shapely >= 2.1), and the validity of every polygon otherwise.
+    """
+    gdf = gdf.copy()
+    if hasattr(shapely, 'coverage_simplify'):
+        gdf['geometry'] = shapely.coverage_simplify(gdf.geometry.values,
+                                                    tolerance)
+    else:
+        gdf['geometry'] = gdf.geometry.simplify(tolerance,
+                                                preserve_topology=True)
+
+    return gdf
+
+
+def read_layer(shapefile, tolerance=None, cache_dir=const.DIR_CACHE):
+    """
+    read_layer(shapefile, tolerance=None, cache_dir=const.DIR_CACHE)
+
+    Read a shapefile layer in EPSG:4326 through the geometry cache.
+
+    Parameters
+    ----------
+    shapefile : str
+        Shapefile path, e.g. `const.SHP_BRAZIL_CITIES`.
+    tolerance : float, optional
+        Simplification tolerance in degrees, for rendering. The default is
+        None, the original geometries.
+    cache_dir : str, optional
+        Directory of the GeoParquet files. The default is `const.DIR_CACHE`.
+        None disables persistence.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        The layer. Columns may be added to it, but its geometries are
+        shared with the cache and must not be modified in place.
+
+    Examples
+    --------
+    >>> from sthunder import helpers
+    >>> cities = helpers.read_layer(const.SHP_BRAZIL_CITIES, tolerance=0.01)
+
+    """
+    key = layer_key(shapefile, tolerance)
+    if key not in _LAYERS:
+        filename = None
+        if cache_dir is not None:
+            filename = os.path.join(cache_dir, 'geometry', f"{key}.parquet")
+
+        if filename is not None and os.path.exists(filename):
+            gdf = gpd.read_parquet(filename)
+        else:
+            gdf = gpd.read_file(shapefile).to_crs('EPSG:4326')
+            if tolerance is not None:
+                gdf = simplify_layer(gdf, tolerance)
+            if filename is not None:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                gdf.to_parquet(f"{filename}.tmp")
+                os.replace(f"{filename}.tmp", filename)
+
+        _LAYERS[key] = gdf
+
+    return _LAYERS[key].copy(deep=False)
+
+
+def get_geometry(shapefile, column, value, cache_dir=const.DIR_CACHE):
+    """
+    get_geometry(shapefile, column, value, cache_dir=const.DIR_CACHE)
+
+    Return the geometry of the feature of a layer whose `column` is
+    `value`, or the union of every feature if `value` is None. With
+    shapely >= 2 the geometry is prepared in place, so repeated predicates
+    on it are fast.
+
+    Examples
+    --------
+    >>> from sthunder import helpers
+    >>> brazil = helpers.get_geometry(const.SHP_SOUTH_AMERICA, 'COUNTRY',
+                                      'Brazil')
+
+    """
+    key = (layer_key(shapefile), column, value)
+    if key not in _GEOMETRIES:
+        gdf = read_layer(shapefile, cache_dir=cache_dir)
+        if value is None:
+            geom = gdf.union_all() if hasattr(gdf, 'union_all') \
+                else gdf.unary_union
+        else:
+            geom = gdf[gdf[column] == value].geometry.iloc[0]
+        if hasattr(shapely, 'prepare'):  # shapely >= 2.0
+            shapely.prepare(geom)
+        _GEOMETRIES[key] = geom
+
+    return _GEOMETRIES[key]
+
+
+def clear_geometry_cache():
+    """
+    Drop the layers and geometries memoized in the process.
+    """
+    _LAYERS.clear()
+    _GEOMETRIES.clear()
@@ -0,0 +1,166 @@
+"""
+Grid masks (:mod: `sthunder.helpers.grid_mask`)
+
+This module provides functions to compute which cells of a regular lon/lat
+grid fall inside a polygon, and to persist those masks so later runs load
+them instead of recomputing them.
+"""
+
+import os
+import hashlib
+import numpy as np
+from shapely.prepared import prep
+import shapely.geometry as sgeom
+from sthunder import constants as const
+from sthunder.helpers.geo_cache import get_geometry
+
+try:
+    from shapely import contains_xy
+except ImportError:  # shapely < 2.0
+    contains_xy = None
+
+
+def load_polygon(shapefile=const.SHP_SOUTH_AMERICA, column='COUNTRY',
+                 value='Brazil'):
+    """
+    load_polygon(shapefile=const.SHP_SOUTH_AMERICA, column='COUNTRY',
+                 value='Brazil')
+
+    Read a polygon from a shapefile, through the geometry cache.
+
+    Parameters
+    ----------
+    shapefile : str, optional
+        Shapefile path. The default is `const.SHP_SOUTH_AMERICA`.
+    column : str, optional
+        Attribute column used to select the feature. The default is
+        'COUNTRY'.
+    value : str, optional
+        Value of `column` for the selected feature. The default is 'Brazil'.
+        None selects the union of all features.
+
+    Returns
+    -------
+    shapely.geometry.base.BaseGeometry
+        The polygon geometry.
+
+    """
+    return get_geometry(shapefile, column, value)
+
+
+def compute_grid_mask(geom, lons, lats):
+    """
+    compute_grid_mask(geom, lons, lats)
+
+    Compute the boolean mask of the grid points contained in `geom`.
+
+    Parameters
+    ----------
+    geom : shapely.geometry.base.BaseGeometry
+        Polygon geometry.
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask with shape (nlat, nlon).
+
+    """
+    mlon, mlat = np.meshgrid(lons, lats)
+    mask = np.zeros(mlon.shape, dtype=bool)
+
+    # Only points inside the polygon bounding box need the predicate.
+    minx, miny, maxx, maxy = geom.bounds
+    inbox = (mlon >= minx) & (mlon <= maxx) & (mlat >= miny) & (mlat <= maxy)
+
+    if contains_xy is not None:
+        mask[inbox] = contains_xy(geom, mlon[inbox], mlat[inbox])
+    else:
+        pgeom = prep(geom)
+        mask[inbox] = [pgeom.contains(sgeom.Point(lon, lat))
+                       for lon, lat in zip(mlon[inbox], mlat[inbox])]
+
+    return mask
+
+
+def grid_mask_key(lons, lats, shapefile, column, value):
+    """
+    grid_mask_key(lons, lats, shapefile, column, value)
+
+    Hash identifying a grid definition and a polygon. The shapefile
+    modification time is part of the key, so editing it invalidates masks.
+    """
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(lons, dtype=np.float64).tobytes())
+    sha.update(np.ascontiguousarray(lats, dtype=np.float64).tobytes())
+    stat = os.stat(shapefile)
+    sha.update(f"{os.path.abspath(shapefile)}|{stat.st_mtime_ns}|"
+               f"{stat.st_size}|{column}|{value}".encode())
+
+    return sha.hexdigest()
+
+
+def get_grid_mask(lons, lats, shapefile=const.SHP_SOUTH_AMERICA,
+                  column='COUNTRY', value='Brazil', geom=None,
+                  cache_dir=const.DIR_CACHE):
+    """
+    get_grid_mask(lons, lats, shapefile=const.SHP_SOUTH_AMERICA,
+                  column='COUNTRY', value='Brazil', geom=None,
+                  cache_dir=const.DIR_CACHE)
+
+    Return the grid mask of a shapefile polygon, loading it from
+    `cache_dir` when it was already computed for the same grid and polygon.
+
+    Parameters
+    ----------
+    lons : numpy.ndarray
+        Grid longitudes, shape (nlon,).
+    lats : numpy.ndarray
+        Grid latitudes, shape (nlat,).
+    shapefile : str, optional
+        Shapefile path, e.g. `const.SHP_SOUTH_AMERICA` or
+        `const.SHP_BRAZIL_STATES`. The default is `const.SHP_SOUTH_AMERICA`.
+    column : str, optional
+        Attribute column used to select the feature. The default is
+        'COUNTRY'.
+    value : str, optional
+        Value of `column` for the selected feature. The default is 'Brazil'.
+        None selects the union of all features.
+    geom : shapely.geometry.base.BaseGeometry, optional
+        Polygon already read from `shapefile`, to avoid reading it again on
+        a cache miss. The default is None.
+    cache_dir : str, optional
+        Directory of the persisted masks. The default is `const.DIR_CACHE`.
+        None disables persistence.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask with shape (nlat, nlon).
+
+    Examples
+    --------
+    >>> from sthunder import helpers
+    >>> mask = helpers.get_grid_mask(glons, glats)
+    >>> lats_idx, lons_idx = np.nonzero(mask)
+
+    """
+    filename = None
+    if cache_dir is not None:
+        key = grid_mask_key(lons, lats, shapefile, column, value)
+        filename = os.path.join(cache_dir, 'grid_mask', f"{key}.npy")
+        if os.path.exists(filename):
+            return np.load(filename)
+
+    if geom is None:
+        geom = load_polygon(shapefile, column, value)
+    mask = compute_grid_mask(geom, lons, lats)
+
+    if filename is not None:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        np.save(filename, mask)
+
+    return mask
@@ -0,0 +1,101 @@
+"""
+Masked reductions (:mod: `sthunder.helpers.masked_reductions`)
+
+This module provides whole-array reductions over the time axis of a
+(time, lat, lon) array, restricted to the cells of a boolean grid mask.
+Only the bounding box of the mask is reduced, as a strided view of the
+data, and cells outside the mask are set to `fill`.
+"""
+
+import numpy as np
+
+
+def index_mask(shape, lats_idx, lons_idx):
+    """
+    index_mask(shape, lats_idx, lons_idx)
+
+    Build the boolean mask of shape (nlat, nlon) with True at the given
+    cell indices, e.g. those returned by `filter_coords_country`.
+    """
+    mask = np.zeros(shape, dtype=bool)
+    mask[lats_idx, lons_idx] = True
+
+    return mask
+
+
+def masked_reduce(data, mask, how='sum', fill=np.nan, threshold=0):
+    """
+    masked_reduce(data, mask, how='sum', fill=np.nan, threshold=0)
+
+    Reduce `data` over its time axis within `mask`.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Array with shape (nt, nlat, nlon).
+    mask : numpy.ndarray
+        Boolean mask with shape (nlat, nlon).
+    how : str, optional
+        Reduction. The default is 'sum'. The options avaiable are 'sum',
+        'max', 'mean' and 'count', the number of time steps above
+        `threshold`.
+    fill : float, optional
+        Value of the cells outside the mask. The default is numpy.nan.
+    threshold : float, optional
+        Threshold of the 'count' reduction. The default is 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        Float64 array with shape (nlat, nlon).
+
+    Examples
+    --------
+    >>> from sthunder import helpers
+    >>> mask = helpers.index_mask(gvars.shape[1:], lats_idx, lons_idx)
+    >>> total = helpers.masked_reduce(gvars, mask, 'sum', fill=0)
+
+    """
+    if how not in ('sum', 'max', 'mean', 'count'):
+        raise ValueError(
+            "how argument value must be 'sum', 'max', 'mean' or 'count'"
+        )
+
+    out = np.full(mask.shape, fill, dtype=np.float64)
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return out
+
+    window = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+    block = data[(slice(None),) + window]
+
+    if how == 'sum':
+        values = block.sum(axis=0, dtype=np.float64)
+    elif how == 'max':
+        values = block.max(axis=0, initial=-np.inf)
+    elif how == 'mean':
+        values = block.mean(axis=0, dtype=np.float64)
+    else:
+        values = np.count_nonzero(block > threshold, axis=0)
+
+    inside = mask[window]
+    out[window][inside] = values[inside]
+
+    return out
+
+
+def masked_sum(data, mask, fill=np.nan):
+    return masked_reduce(data, mask, 'sum', fill)
+
+
+def masked_max(data, mask, fill=np.nan):
+    return masked_reduce(data, mask, 'max', fill)
+
+
+def masked_mean(data, mask, fill=np.nan):
+    return masked_reduce(data, mask, 'mean', fill)
+
+
+def masked_count(data, mask, fill=np.nan, threshold=0):
+    return masked_reduce(data, mask, 'count', fill, threshold)
@@ -1 +1,5 @@
 from .som_core import *
+from .som_bmu import *
+from .som_batch import *
+from .som_sweep import *
+from .som_cache import *
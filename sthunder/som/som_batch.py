@@ -0,0 +1,252 @@
+"""
+Batch SOM trainer (:mod: `sthunder.som.som_batch`)
+
+This module provides `BatchSOM`, a MiniSom trained with the batch algorithm
+of Kohonen (`MiniSom.train_batch_offline`) on float32 weights. Each iteration
+assigns every sample to its best matching unit chunk by chunk, with the
+matrix product distances of `som_bmu`, sums the samples per unit, and spreads
+the sums over the map with a single neighborhood matrix product, instead of
+one neighborhood evaluation and weight update per sample.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from minisom import MiniSom
+from sthunder.som.som_bmu import (activation_distance_name, batch_winners,
+                                  chunk_distances)
+
+
+class BatchSOM(MiniSom):
+    """
+    BatchSOM(x, y, input_len, sigma=1, learning_rate=0.5,
+             neighborhood_function='gaussian', topology='rectangular',
+             activation_distance='euclidean', random_seed=None,
+             dtype=numpy.float32, chunk_size=None, **kwargs)
+
+    MiniSom with float32 weights and a vectorized batch training. Every
+    MiniSom method is available, `winner` and `get_weights` included, and
+    `activation_response`, `quantization` and `quantization_error` process
+    the samples in chunks.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype, optional
+        Weights and data type. The default is numpy.float32.
+    chunk_size : int, optional
+        Number of samples per chunk. The default is None, chunks of about
+        256 MiB of distances.
+    **kwargs : dict
+        Other minisom.MiniSom arguments.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> SOM = som.BatchSOM(13, 13, data.shape[1], sigma=3, learning_rate=0.5)
+    >>> SOM.random_weights_init(data)
+    >>> SOM.train_batch_offline(data, 50)
+
+    """
+
+    def __init__(self, x, y, input_len, *args, dtype=np.float32,
+                 chunk_size=None, **kwargs):
+        super().__init__(x, y, input_len, *args, **kwargs)
+        self._weights = self._weights.astype(dtype)
+        self.chunk_size = chunk_size
+
+    @property
+    def activation_distance(self):
+        return activation_distance_name(self)
+
+    def _chunks(self, data):
+        size = self.chunk_size or max(1, (256*2**20) //
+                                      (8*self._activation_map.size))
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    def neighborhood_matrix(self, sigma):
+        """
+        neighborhood_matrix(sigma)
+
+        Return the neighborhood function of every neuron, one flattened map
+        per row, shape (nneuron, nneuron).
+        """
+        shape = self._activation_map.shape
+        return np.stack([self.neighborhood(np.unravel_index(k, shape),
+                                           sigma).ravel()
+                         for k in range(self._activation_map.size)])
+
+    def winners(self, data):
+        """
+        winners(data)
+
+        Return the (row, col) coordinates of the winning neuron of every
+        sample, shape (nsample, 2).
+        """
+        return batch_winners(self, np.asarray(data, self._weights.dtype),
+                             self.chunk_size)[0]
+
+    def train_batch_offline(self, data, num_iteration, verbose=False):
+        """
+        train_batch_offline(data, num_iteration, verbose=False)
+
+        Train with the batch algorithm, as `MiniSom.train_batch_offline`:
+        at each iteration every neuron moves towards the mean of the
+        samples weighted by the neighborhood of their winning neuron, at
+        the decayed learning rate.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Samples with shape (nsample, input_len).
+        num_iteration : int
+            Number of iterations, each over the whole data.
+        verbose : bool, optional
+            If the quantization error is printed at the end. The default is
+            False.
+
+        """
+        self._check_iteration_number(num_iteration)
+        self._check_input_len(data)
+        data = np.asarray(data, self._weights.dtype)
+        distance = self.activation_distance
+        nneuron = self._activation_map.size
+        flat = self._weights.reshape(nneuron, -1)
+
+        for iteration in range(num_iteration):
+            learning_rate = self._learning_rate_decay_function(
+                self._learning_rate, iteration, num_iteration
+            )
+            sigma = self._sigma_decay_function(self._sigma, iteration,
+                                               num_iteration)
+
+            wsq = (flat**2).sum(axis=1)
+            wnorm = np.sqrt(wsq)
+            sums = np.zeros_like(flat)
+            counts = np.zeros(nneuron)
+            for chunk in self._chunks(data):
+                best = chunk_distances(chunk, flat, distance, wsq,
+                                       wnorm).argmin(axis=1)
+                onehot = sp.csr_matrix(
+                    (np.ones(len(chunk), flat.dtype),
+                     (best, np.arange(len(chunk)))),
+                    shape=(nneuron, len(chunk))
+                )
+                sums += onehot @ chunk
+                counts += np.bincount(best, minlength=nneuron)
+
+            # h[k, j] is the neighborhood of neuron j around winner k.
+            h = self.neighborhood_matrix(sigma)
+            numerator = (h.T @ sums).astype(flat.dtype)
+            denominator = h.T @ counts
+
+            mask = denominator > 0
+            flat[mask] = ((1 - learning_rate)*flat[mask] + learning_rate *
+                          numerator[mask]/denominator[mask, None])
+
+        if verbose:
+            print(f"Quantization Error: {self.quantization_error(data):.4f}")
+
+    def activation_response(self, data):
+        self._check_input_len(data)
+        index = np.ravel_multi_index(self.winners(data).T,
+                                     self._activation_map.shape)
+
+        return np.bincount(index, minlength=self._activation_map.size
+                           ).reshape(self._activation_map.shape).astype(float)
+
+    def quantization(self, data):
+        self._check_input_len(data)
+        data = np.asarray(data, self._weights.dtype)
+        winners, _, _ = batch_winners(self._weights, data, self.chunk_size)
+
+        return self._weights[winners[:, 0], winners[:, 1]]
+
+    def quantization_error(self, data):
+        self._check_input_len(data)
+
+        return batch_winners(self._weights,
+                             np.asarray(data, self._weights.dtype),
+                             self.chunk_size)[2]
+
+
+def create_and_fitting_batch_som(data, nrow, ncol, weights_init='random',
+                                 n_it=50, sigma=1.0, lr=0.5, nf='gaussian',
+                                 topology='rectangular', ad='euclidean',
+                                 random_seed=42, chunk_size=None,
+                                 **kwargs) -> BatchSOM:
+    """
+    create_and_fitting_batch_som(data, nrow, ncol, weights_init='random',
+                                 n_it=50, sigma=1.0, lr=0.5, nf='gaussian',
+                                 topology='rectangular', ad='euclidean',
+                                 random_seed=42, chunk_size=None, **kwargs)
+
+    Create and fit a `BatchSOM`, as `create_and_fitting_minisom` does a
+    MiniSom.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Data for fit SOM.
+    nrow : int
+        Number of rows in the SOM map.
+    ncol : int
+        Number of columns in the SOM map.
+    weights_init : str
+        Weights initialization method. The default is 'random'. The options
+        avaiable are 'random' and 'pca'.
+    n_it : int
+        Number of batch iterations, each over the whole data. The default
+        is 50.
+    sigma : float, optional
+        Parameter sigma in SOM map. The default is 1.0.
+    lr : float, optional
+        Parameter learning rate in SOM map. The default is 0.5.
+    nf : str, optional
+        Parameter neighborhood function. The default is 'gaussian'. The
+        options avaiable are 'gaussian', 'mexican_hat', 'bubble' and
+        'triangle'.
+    topology : str, optional
+        Parameter topology in SOM map. The default is 'rectangular'. The
+        options avaiable are 'rectangular' and 'hexagonal'.
+    ad : str, optional
+        Parameter activation distance in SOM map. The default is
+        'euclidean'. The options avaiable are 'euclidean', 'cosine',
+        'manhattan' and 'chebyshev'.
+    random_seed : int, optional
+        The seed for reproducible experiments. The default is 42. None
+        define a random seed.
+    chunk_size : int, optional
+        Number of samples per chunk. The default is None, chunks of about
+        256 MiB of distances.
+    **kwargs : dict
+        Optional BatchSOM class argument, e.g. `dtype`.
+
+    Returns
+    -------
+    SOM : BatchSOM
+        The SOM object fitted.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> SOM = som.create_and_fitting_batch_som(data, 13, 13, sigma=3)
+    >>> color_map, alpha_map = som.get_color_and_alpha_maps(SOM, data)
+
+    """
+    SOM = BatchSOM(nrow, ncol, data.shape[1], sigma=sigma, learning_rate=lr,
+                   neighborhood_function=nf, topology=topology,
+                   activation_distance=ad, random_seed=random_seed,
+                   chunk_size=chunk_size, **kwargs)
+
+    if weights_init == 'random':
+        SOM.random_weights_init(data=data)
+    elif weights_init == 'pca':
+        SOM.pca_weights_init(data=data)
+    else:
+        raise ValueError(
+            f"weights_init argument value must be 'random' or 'pca'"
+        )
+
+    SOM.train_batch_offline(data=data, num_iteration=n_it)
+
+    return SOM
@@ -0,0 +1,161 @@
+"""
+Batch best matching units (:mod: `sthunder.som.som_bmu`)
+
+This module provides the best matching unit (BMU) of many samples at once,
+instead of one `MiniSom.winner` call per sample. Samples are processed in
+chunks, so memory stays bounded whatever the number of samples, and the
+euclidean and cosine distances of a chunk to every neuron are computed with
+a single matrix product.
+"""
+
+import numpy as np
+
+
+DISTANCES = ('euclidean', 'cosine', 'manhattan', 'chebyshev')
+
+
+def activation_distance_name(SOM):
+    """
+    activation_distance_name(SOM)
+
+    Return the name of the activation distance of a MiniSom object, e.g.
+    'euclidean'.
+    """
+    func = getattr(SOM, '_activation_distance', None)
+    name = getattr(func, '__name__', '_euclidean_distance')
+    name = name.strip('_').replace('_distance', '')
+    if name not in DISTANCES:
+        raise ValueError(f"activation distance {name} is not supported, "
+                         f"the options avaiable are {DISTANCES}")
+
+    return name
+
+
+def chunk_distances(chunk, weights, distance='euclidean', wsq=None,
+                    wnorm=None):
+    """
+    chunk_distances(chunk, weights, distance='euclidean', wsq=None,
+                    wnorm=None)
+
+    Return the distances of every sample of `chunk` (nchunk, input_len) to
+    every neuron of the flat `weights` (nneuron, input_len), with the
+    definitions of MiniSom. `wsq` and `wnorm`, the squared and plain norms
+    of the weights, may be given to avoid recomputing them.
+    """
+    if distance == 'euclidean':
+        wsq = (weights**2).sum(axis=1) if wsq is None else wsq
+        d2 = ((chunk**2).sum(axis=1)[:, None] - 2*chunk @ weights.T +
+              wsq[None, :])
+        return np.sqrt(np.maximum(d2, 0))
+
+    if distance == 'cosine':
+        wnorm = np.linalg.norm(weights, axis=1) if wnorm is None else wnorm
+        xnorm = np.linalg.norm(chunk, axis=1)
+        return 1 - (chunk @ weights.T) / (xnorm[:, None]*wnorm[None, :] +
+                                          1e-8)
+
+    if distance not in ('manhattan', 'chebyshev'):
+        raise ValueError(f"distance argument value must be one of "
+                         f"{DISTANCES}")
+
+    # One neuron at a time, the (nchunk, nneuron, input_len) differences
+    # are never held in memory.
+    dist = np.empty((len(chunk), len(weights)))
+    for j, neuron in enumerate(weights):
+        diff = chunk - neuron
+        if distance == 'manhattan':
+            dist[:, j] = np.abs(diff).sum(axis=1)
+        else:
+            # MiniSom's chebyshev distance is the signed maximum difference.
+            dist[:, j] = diff.max(axis=1)
+
+    return dist
+
+
+def batch_winners(SOM, data, chunk_size=None, distance=None,
+                  max_memory=256*2**20):
+    """
+    batch_winners(SOM, data, chunk_size=None, distance=None,
+                  max_memory=256*2**20)
+
+    Compute the best matching unit of every sample.
+
+    Parameters
+    ----------
+    SOM : minisom.MiniSom or numpy.ndarray
+        A MiniSom object fitted, or its weights with shape
+        (nrow, ncol, input_len).
+    data : numpy.ndarray
+        Normalized samples with shape (nsample, input_len).
+    chunk_size : int, optional
+        Number of samples per chunk. The default is None, the largest
+        chunk whose temporary arrays fit in `max_memory`.
+    distance : str, optional
+        Activation distance. The default is None, the one of `SOM`, or
+        'euclidean' for weights. The options avaiable are 'euclidean',
+        'cosine', 'manhattan' and 'chebyshev'.
+    max_memory : int, optional
+        Bytes of the temporary arrays of a chunk when `chunk_size` is None.
+        The default is 256 MiB.
+
+    Returns
+    -------
+    tuple
+        winners : numpy.ndarray
+            Integer (row, col) coordinates of the BMU of every sample,
+            shape (nsample, 2).
+        distances : numpy.ndarray
+            Activation distance of every sample to its BMU, shape
+            (nsample,).
+        quantization_error : float
+            Mean euclidean distance of the samples to their closest
+            neuron, as `MiniSom.quantization_error`.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> winners, dist, qe = som.batch_winners(SOM, norm.transform(df.values.T))
+    >>> colors = color_map[winners[:, 0], winners[:, 1]]
+
+    """
+    if isinstance(SOM, np.ndarray):
+        weights = SOM
+        distance = distance or 'euclidean'
+    else:
+        weights = SOM._weights
+        distance = distance or activation_distance_name(SOM)
+
+    shape = weights.shape[:-1]
+    flat = weights.reshape(-1, weights.shape[-1])
+    data = np.asarray(data)
+    nsample, nneuron = len(data), len(flat)
+
+    if chunk_size is None:
+        # Distance matrices of the chunk, the euclidean one and the
+        # activation one.
+        chunk_size = max(1, int(max_memory // (16*nneuron)))
+
+    wsq = (flat**2).sum(axis=1)
+    wnorm = np.sqrt(wsq)
+
+    index = np.empty(nsample, dtype=np.int64)
+    distances = np.empty(nsample)
+    qe_sum = 0.
+    for start in range(0, nsample, chunk_size):
+        chunk = data[start:start + chunk_size]
+        euclidean = chunk_distances(chunk, flat, 'euclidean', wsq)
+        dist = euclidean if distance == 'euclidean' else \
+            chunk_distances(chunk, flat, distance, wsq, wnorm)
+
+        best = dist.argmin(axis=1)
+        index[start:start + len(chunk)] = best
+        distances[start:start + len(chunk)] = dist[np.arange(len(chunk)),
+                                                   best]
+        # MiniSom quantizes with the euclidean distance whatever the
+        # activation distance.
+        qe_sum += euclidean.min(axis=1).sum()
+
+    winners = np.stack(np.unravel_index(index, shape), axis=1)
+    qe = qe_sum/nsample if nsample else np.nan
+
+    return winners, distances, qe
@@ -0,0 +1,239 @@
+"""
+Fitted SOM cache (:mod: `sthunder.som.som_cache`)
+
+This module persists a fitted SOM with the scaler of its input and the best
+matching unit of every sample, in a single `.npz` file. Files are addressed
+by a hash of the raw input data and of the fitting arguments, so a repeated
+run with the same data and parameters loads the SOM instead of training it.
+"""
+
+import os
+import json
+import inspect
+import hashlib
+import numpy as np
+from minisom import MiniSom
+from sklearn.preprocessing import MinMaxScaler
+from sthunder import constants as const
+from sthunder.som.som_core import create_and_fitting_minisom
+from sthunder.som.som_batch import BatchSOM, create_and_fitting_batch_som
+from sthunder.som.som_bmu import batch_winners
+
+
+ENGINES = {
+    'minisom': (MiniSom, create_and_fitting_minisom),
+    'batch': (BatchSOM, create_and_fitting_batch_som),
+}
+
+SCALER_ATTRS = ('min_', 'scale_', 'data_min_', 'data_max_', 'data_range_')
+
+# Arguments that do not change the fitted weights.
+_IGNORED = ('data', 'chunk_size')
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    try:
+        return np.dtype(value).str
+    except TypeError:
+        return str(value)
+
+
+def _numeric(value):
+    # 1, 1.0 and numpy.float32(1) hash alike.
+    if isinstance(value, (list, tuple)):
+        return [_numeric(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def fitting_params(engine='minisom', **kwargs):
+    """
+    fitting_params(engine='minisom', **kwargs)
+
+    Return every argument of the fitting function of `engine`, the defaults
+    included, except the data, as a JSON serializable dict.
+    """
+    func = ENGINES[engine][1]
+    bound = inspect.signature(func).bind_partial(**kwargs)
+    bound.apply_defaults()
+    params = {key: value for key, value in bound.arguments.items()
+              if key not in _IGNORED}
+    params.update(params.pop('kwargs', {}))
+
+    return json.loads(json.dumps(params, default=_jsonable))
+
+
+def som_key(values, engine='minisom', feature_range=(0, 1), **kwargs):
+    """
+    som_key(values, engine='minisom', feature_range=(0, 1), **kwargs)
+
+    Hash of the raw input `values`, of the scaler range and of the fitting
+    arguments, numbers hashed as floats whatever their type.
+    """
+    values = np.ascontiguousarray(values)
+    params = {key: _numeric(value)
+              for key, value in fitting_params(engine, **kwargs).items()}
+    feature_range = _numeric(json.loads(json.dumps(list(feature_range),
+                                                   default=_jsonable)))
+
+    sha = hashlib.sha1()
+    sha.update(f"{values.shape}|{values.dtype.str}|{engine}|"
+               f"{tuple(feature_range)}|".encode())
+    sha.update(json.dumps(params, sort_keys=True).encode())
+    sha.update(values.data if values.size else b'')
+
+    return sha.hexdigest()
+
+
+def save_som(path, SOM, norm=None, winners=None, params=None,
+             engine='minisom'):
+    """
+    save_som(path, SOM, norm=None, winners=None, params=None,
+             engine='minisom')
+
+    Save the weights of a fitted SOM, its fitted MinMaxScaler, the best
+    matching units of its samples and its fitting arguments in the
+    compressed file `path`.
+    """
+    arrays = {'weights': SOM._weights,
+              'params': np.array(json.dumps({'engine': engine,
+                                             **(params or {})}))}
+    if norm is not None:
+        arrays['feature_range'] = np.asarray(norm.feature_range)
+        arrays['n_samples_seen'] = np.asarray(norm.n_samples_seen_)
+        for attr in SCALER_ATTRS:
+            arrays[f"scaler_{attr}"] = getattr(norm, attr)
+    if winners is not None:
+        arrays['winners'] = np.asarray(winners, dtype=np.int16)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.tmp", 'wb') as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_som(path):
+    """
+    load_som(path)
+
+    Load a file of `save_som`.
+
+    Returns
+    -------
+    tuple
+        SOM : minisom.MiniSom or BatchSOM
+            The SOM, with the saved weights.
+        norm : sklearn.preprocessing.MinMaxScaler or None
+            The fitted scaler.
+        winners : numpy.ndarray or None
+            (row, col) of the best matching unit of every sample.
+        params : dict
+            The fitting arguments and 'engine'.
+
+    """
+    with np.load(path) as npz:
+        params = json.loads(str(npz['params']))
+        weights = npz['weights']
+
+        cls, func = ENGINES[params['engine']]
+        # Arguments of the SOM class passed through the fitting `**kwargs`.
+        extra = {key: value for key, value in params.items()
+                 if key not in inspect.signature(func).parameters and
+                 key not in ('engine', 'dtype')}
+        if cls is BatchSOM:
+            extra['dtype'] = weights.dtype
+        SOM = cls(x=weights.shape[0], y=weights.shape[1],
+                  input_len=weights.shape[2], sigma=params['sigma'],
+                  learning_rate=params['lr'],
+                  neighborhood_function=params['nf'],
+                  topology=params['topology'],
+                  activation_distance=params['ad'],
+                  random_seed=params['random_seed'], **extra)
+        SOM._weights = weights
+
+        norm = None
+        if 'feature_range' in npz:
+            norm = MinMaxScaler(feature_range=tuple(npz['feature_range']))
+            for attr in SCALER_ATTRS:
+                setattr(norm, attr, npz[f"scaler_{attr}"])
+            norm.n_samples_seen_ = int(npz['n_samples_seen'])
+            norm.n_features_in_ = len(norm.scale_)
+
+        winners = npz['winners'].astype(np.intp) if 'winners' in npz \
+            else None
+
+    return SOM, norm, winners, params
+
+
+def get_fitted_som(values, nrow, ncol, engine='minisom',
+                   feature_range=(0, 1), cache_dir=const.DIR_CACHE,
+                   rebuild=False, **kwargs):
+    """
+    get_fitted_som(values, nrow, ncol, engine='minisom',
+                   feature_range=(0, 1), cache_dir=const.DIR_CACHE,
+                   rebuild=False, **kwargs)
+
+    Return the SOM fitted on the min-max scaled `values`, loading it from
+    the cache if it was already fitted with the same data and arguments,
+    and fitting and saving it otherwise.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Raw data with shape (nsample, input_len), e.g. `df.values.T`.
+    nrow : int
+        Number of rows in the SOM map.
+    ncol : int
+        Number of columns in the SOM map.
+    engine : str, optional
+        Trainer, 'minisom' (`create_and_fitting_minisom`) or 'batch'
+        (`create_and_fitting_batch_som`). The default is 'minisom'.
+    feature_range : tuple, optional
+        Range of the scaled data. The default is (0, 1).
+    cache_dir : str, optional
+        Cache directory. The default is `const.DIR_CACHE`.
+    rebuild : bool, optional
+        If the SOM must be fitted even if cached. The default is False.
+    **kwargs : dict
+        Other arguments of the fitting function, e.g. `sigma`, `lr`, `nf`.
+
+    Returns
+    -------
+    tuple
+        SOM : minisom.MiniSom or BatchSOM
+            The SOM fitted.
+        norm : sklearn.preprocessing.MinMaxScaler
+            The scaler fitted on `values`.
+        winners : numpy.ndarray
+            (row, col) of the best matching unit of every sample, shape
+            (nsample, 2).
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> SOM, norm, winners = som.get_fitted_som(df.values.T, 13, 13,
+                                                sigma=3, nf='triangle')
+
+    """
+    kwargs = {'nrow': nrow, 'ncol': ncol, **kwargs}
+    key = som_key(values, engine, feature_range=feature_range, **kwargs)
+    path = os.path.join(cache_dir, 'som', f"{key}.npz")
+
+    if not rebuild and os.path.exists(path):
+        SOM, norm, winners, _ = load_som(path)
+        return SOM, norm, winners
+
+    norm = MinMaxScaler(feature_range=feature_range)
+    data = norm.fit_transform(values)
+    SOM = ENGINES[engine][1](data, **kwargs)
+    winners, _, _ = batch_winners(SOM, data)
+
+    save_som(path, SOM, norm, winners, fitting_params(engine, **kwargs),
+             engine)
+
+    return SOM, norm, winners
@@ -83,6 +83,115 @@ def create_and_fitting_minisom(data, nrow, ncol, weights_init='random',
     return SOM
 
 
+def activity_fractions(weights, thr_v=0.05):
+    """
+    activity_fractions(weights, thr_v=0.05)
+
+    Fraction of the weights of every neuron above `thr_v`.
+
+    A few thresholds are compared directly with the whole weight tensor.
+    Many thresholds are evaluated in a single pass over the weights: each
+    weight is ranked among the sorted thresholds, and the ranks are counted
+    per neuron.
+
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        SOM weights with shape (nrow, ncol, input_len).
+    thr_v : float or array_like, optional
+        Weight threshold, or 1-D array of thresholds. The default is 0.05.
+
+    Returns
+    -------
+    numpy.ndarray
+        Fractions with shape (nrow, ncol), or (nthr, nrow, ncol) for an
+        array of thresholds. NaN weights are not counted.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> fractions = som.activity_fractions(SOM._weights, [0.01, 0.05, 0.1])
+
+    """
+    thresholds = np.atleast_1d(np.asarray(thr_v, dtype=np.float64))
+    order = np.argsort(thresholds)
+    nthr = len(thresholds)
+
+    flat = weights.reshape(-1, weights.shape[-1])
+    nneuron = len(flat)
+    valid = ~np.isnan(flat)
+    total = valid.sum(axis=1)
+    total = np.where(total > 0, total, 1)
+
+    if nthr <= 4:
+        fractions = np.stack([np.count_nonzero(flat > thr, axis=1)/total
+                              for thr in thresholds])
+        fractions = fractions.reshape(nthr, *weights.shape[:-1])
+
+        return fractions if np.ndim(thr_v) else fractions[0]
+
+    # rank = number of thresholds strictly below the weight, so a weight is
+    # above threshold k (in sorted order) if its rank is greater than k.
+    ranks = np.searchsorted(thresholds[order], flat, side='left')
+    ranks[~valid] = nthr + 1
+
+    counts = np.bincount(
+        (np.arange(nneuron)[:, None]*(nthr + 2) + ranks).ravel(),
+        minlength=nneuron*(nthr + 2)
+    ).reshape(nneuron, nthr + 2)[:, :nthr + 1]
+    above = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:]
+
+    fractions = np.empty((nneuron, nthr))
+    fractions[:, order] = above/total[:, None]
+    fractions = fractions.T.reshape(nthr, *weights.shape[:-1])
+
+    return fractions if np.ndim(thr_v) else fractions[0]
+
+
+def classify_neurons(fractions, thr_p=0.05, normalize_alpha=True):
+    """
+    classify_neurons(fractions, thr_p=0.05, normalize_alpha=True)
+
+    Label neurons as active ('red') when their activity fraction is at
+    least `thr_p`, inactive ('blue') otherwise, and compute their alphas.
+
+    Parameters
+    ----------
+    fractions : numpy.ndarray
+        Activity fractions with shape (..., nrow, ncol), e.g. from
+        `activity_fractions`.
+    thr_p : float or array_like, optional
+        Fraction threshold, broadcast against the leading dimensions of
+        `fractions`. The default is 0.05. For a sweep over both thresholds,
+        pass fractions of shape (nthr_v, nrow, ncol) and thr_p with shape
+        (nthr_p, 1).
+    normalize_alpha : bool, optional
+        If alpha values must be normalized by the maximum of their label
+        in each map. The default is True.
+
+    Returns
+    -------
+    tuple
+        color_map : numpy.ndarray
+            Neurons colors, 'red' or 'blue'.
+        alpha_map : numpy.ndarray
+            Neurons alphas.
+
+    """
+    thr_p = np.asarray(thr_p, dtype=np.float64)[..., None, None]
+    active = fractions >= thr_p
+    alpha_map = np.broadcast_to(fractions, active.shape).astype(np.float64)
+
+    if normalize_alpha:
+        for label in (active, ~active):
+            vmax = np.where(label, alpha_map, -np.inf).max(axis=(-2, -1),
+                                                           keepdims=True)
+            scale = np.where(np.isfinite(vmax) & (vmax > 0), vmax, 1)
+            alpha_map = np.where(label, alpha_map/scale, alpha_map)
+
+    return np.where(active, 'red', 'blue'), alpha_map
+
+
 def get_color_and_alpha_maps(SOM, data, thr_v=0.05, thr_p=0.05, 
                              normalize_alpha=True, **kwags) -> tuple:
     """
@@ -95,6 +204,12 @@ def get_color_and_alpha_maps(SOM, data, thr_v=0.05, thr_p=0.05,
         A MiniSom object fitted.
     data : numpy.ndarray
         Data used to fit MiniSom object.
+    thr_v : float or array_like, optional
+        Weight threshold of an active input, or 1-D array of thresholds.
+        The default is 0.05.
+    thr_p : float or array_like, optional
+        Fraction of active inputs of an active neuron, broadcast against
+        `thr_v` (see `classify_neurons`). The default is 0.05.
     normalize_alpha : bool, optional
         If alpha values must be normalized. The default is True.
     **kwags : TYPE
@@ -104,35 +219,19 @@ def get_color_and_alpha_maps(SOM, data, thr_v=0.05, thr_p=0.05,
     -------
     tuple
         color_map : numpy.ndarray
-            Matrix with neurons color map.
+            Matrix with neurons color map, with the leading threshold
+            dimensions of `thr_v` and `thr_p`, if any.
         alpha_map : numpy.ndarray
             Matrix with neurons alpha color map.
 
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> color_map, alpha_map = som.get_color_and_alpha_maps(SOM, data)
+    >>> colors, alphas = som.get_color_and_alpha_maps(
+            SOM, data, thr_v=np.linspace(0.01, 0.2, 20))
+
     """
+    fractions = activity_fractions(SOM._weights, thr_v)
     
-    weights = SOM._weights
-    
-    color_map = np.full((*SOM._weights.shape[:-1],), 'white')
-    alpha_map = np.full((*SOM._weights.shape[:-1],), 0.)
-    
-    for i in np.arange(weights.shape[0]):
-        for j in np.arange(weights.shape[1]):
-            w = weights[i, j, :]
-            act = len(w[w>thr_v])
-            ina = len(w[w<=thr_v])
-            
-            if act/(act+ina) >= thr_p:
-                color_map[i][j] = 'red'
-                alpha_map[i][j] = act/(act+ina)
-            else:
-                color_map[i][j] = 'blue'
-                alpha_map[i][j] = act/(act+ina)
-                
-    if normalize_alpha:
-        xb, yb = np.where(color_map == 'blue')
-        xr, yr = np.where(color_map == 'red')
-    
-        alpha_map[xb, yb] = alpha_map[xb, yb]/alpha_map[xb, yb].max()
-        alpha_map[xr, yr] = alpha_map[xr, yr]/alpha_map[xr, yr].max()
-    
-    return color_map, alpha_map
\ No newline at end of file
+    return classify_neurons(fractions, thr_p, normalize_alpha)
@@ -0,0 +1,163 @@
+"""
+SOM hyperparameter sweep (:mod: `sthunder.som.som_sweep`)
+
+This module provides a driver that fits a grid of SOM configurations on a
+process pool and ranks them by quality. The input matrix is copied once into
+shared memory, which every worker maps instead of receiving a pickled copy
+per configuration.
+"""
+
+import time as tm
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from sthunder.som.som_core import create_and_fitting_minisom
+from sthunder.som.som_batch import create_and_fitting_batch_som
+
+
+ENGINES = {
+    'minisom': create_and_fitting_minisom,
+    'batch': create_and_fitting_batch_som,
+}
+
+METRICS = ('quantization_error', 'topographic_error', 'time')
+
+_SHARED = None
+
+
+def parameter_grid(**params):
+    """
+    parameter_grid(**params)
+
+    Return every combination of the values of `params`, one dict per
+    configuration.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> som.parameter_grid(nrow=[10, 13], ncol=[10, 13], sigma=[1, 3])
+
+    """
+    keys = list(params)
+    values = [np.atleast_1d(params[key]).tolist() for key in keys]
+
+    return [dict(zip(keys, combination))
+            for combination in itertools.product(*values)]
+
+
+def _attach(name, shape, dtype):
+    global _SHARED
+
+    shm = shared_memory.SharedMemory(name=name)
+    # The segment is kept referenced as long as its view is used.
+    _SHARED = shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _fit_config(task):
+    i, engine, config = task
+    data = _SHARED[1]
+    record = {'config': i, **config}
+    try:
+        start = tm.perf_counter()
+        SOM = ENGINES[engine](data, **config)
+        record['time'] = tm.perf_counter() - start
+        record['quantization_error'] = float(SOM.quantization_error(data))
+        record['topographic_error'] = float(SOM.topographic_error(data))
+        record['error'] = None
+    except Exception as error:
+        record['error'] = f"{type(error).__name__}: {error}"
+
+    return record
+
+
+def sweep_som(data, configs, engine='minisom', processes=None,
+              rank_by=('quantization_error', 'topographic_error'),
+              verbose=True, **kwargs):
+    """
+    sweep_som(data, configs, engine='minisom', processes=None,
+              rank_by=('quantization_error', 'topographic_error'),
+              verbose=True, **kwargs)
+
+    Fit every SOM configuration on a process pool and rank them.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Normalized data with shape (nsample, input_len), shared with the
+        workers.
+    configs : list or dict
+        Configurations, dicts of `create_and_fitting_minisom` arguments
+        (`nrow`, `ncol`, `sigma`, `lr`, `nf`, `topology`, ...), or a dict of
+        lists of values, expanded with `parameter_grid`.
+    engine : str, optional
+        Trainer, 'minisom' (`create_and_fitting_minisom`) or 'batch'
+        (`create_and_fitting_batch_som`). The default is 'minisom'.
+    processes : int, optional
+        Number of worker processes. The default is None, the number of
+        CPUs.
+    rank_by : tuple, optional
+        Metrics ranking the configurations, lower is better. The default is
+        ('quantization_error', 'topographic_error').
+    verbose : bool, optional
+        If the metrics of each configuration are printed as it finishes.
+        The default is True.
+    **kwargs : dict
+        Arguments shared by every configuration, e.g. `n_it`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per configuration, best first, with the configuration
+        arguments, 'quantization_error', 'topographic_error', 'time' (fit
+        wall time, in seconds), 'rank' and 'error', the exception of the
+        configurations that failed, ranked last.
+
+    Examples
+    --------
+    >>> from sthunder import som
+    >>> table = som.sweep_som(data, {'nrow': [10, 13], 'ncol': [10, 13],
+                                     'sigma': [1, 3], 'nf': ['gaussian',
+                                                             'triangle']},
+                              n_it=500)
+    >>> best = table.iloc[0]
+
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine argument value must be one of "
+                         f"{tuple(ENGINES)}")
+    if isinstance(configs, dict):
+        configs = parameter_grid(**configs)
+    tasks = [(i, engine, {**kwargs, **config})
+             for i, config in enumerate(configs)]
+
+    data = np.ascontiguousarray(data)
+    shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+    try:
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+
+        records = []
+        ctx = mp.get_context()
+        with ctx.Pool(processes=processes, initializer=_attach,
+                      initargs=(shm.name, data.shape, data.dtype)) as pool:
+            for record in pool.imap_unordered(_fit_config, tasks):
+                records.append(record)
+                if verbose:
+                    status = record['error'] or ', '.join(
+                        f"{key}={record[key]:.4f}" for key in METRICS
+                    )
+                    print(f"[{len(records)}/{len(tasks)}] config "
+                          f"{record['config']}: {status}")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    table = pd.DataFrame.from_records(records).set_index('config')
+    for key in METRICS:
+        if key not in table:
+            table[key] = np.nan
+    table = table.sort_values(list(rank_by), na_position='last')
+    table['rank'] = np.arange(1, len(table) + 1)
+
+    return table
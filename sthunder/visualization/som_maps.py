@@ -6,8 +6,9 @@ This module provides functions to SOM visualization.
 
 import matplotlib.pyplot as plt
 import numpy as np
-import geopandas as gpd
 from sthunder import constants as const
+from sthunder import helpers
+from sthunder import som
 
 
 def plot_weights(SOM, data, dim=0, **kwargs):    
@@ -120,19 +121,15 @@ def plot_single_hourly_density_city_map(SOM, df, norm, color_map, alpha_map,
                                                 alpha_map)
 
     """
-    ngdf = gpd.read_file(
-        const.SHP_BRAZIL_CITIES
+    ngdf = helpers.read_layer(
+        const.SHP_BRAZIL_CITIES, tolerance=0.01
     ).set_index('nome').loc[df.columns][['geometry']]
     
-    c, a = [], []
-    for i, (city, row) in enumerate(ngdf.iterrows()):
-        winner = SOM.winner(norm.transform(df[[city]].values.T)[0])
+    data = norm.transform(df.values.T)[df.columns.get_indexer(ngdf.index)]
+    winners, _, _ = som.batch_winners(SOM, data)
         
-        c.append(color_map[winner[0]][winner[1]])
-        a.append(alpha_map[winner[0]][winner[1]])
-        
-    ngdf['color'] = c
-    ngdf['alpha'] = a
+    ngdf['color'] = color_map[winners[:, 0], winners[:, 1]]
+    ngdf['alpha'] = alpha_map[winners[:, 0], winners[:, 1]]
     
     
     dpi = kwargs.get('dpi', 100)
@@ -0,0 +1,58 @@
+import numpy as np
+from sthunder.database import db_bulk
+
+
+class StubCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        self.connection.statements.append((query, params))
+
+    def executemany(self, query, rows):
+        self.connection.rows.extend(rows)
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+
+    def __init__(self):
+        self.statements, self.rows = [], []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_bulk_insert_flash_resumes_from_start():
+    time_ids = np.arange(100, 110)
+    coord_ids = np.array([1, 2, 3])
+    totals = np.arange(30).reshape(10, 3)
+    connection = StubConnection()
+    committed = []
+
+    stats = db_bulk.bulk_insert_flash(
+        connection, time_ids, coord_ids, totals, method='executemany',
+        chunk_size=4, start=5, replace_start=True,
+        on_commit=committed.append, verbose=False
+    )
+
+    rows = np.array(connection.rows)
+    assert stats['rows'] == 15
+    assert np.array_equal(np.unique(rows[:, 0]), time_ids[5:])
+    assert np.array_equal(rows[:, 2], totals[5:].ravel())
+    assert committed == [9, 10]
+    assert connection.commits == 2 and connection.rollbacks == 0
+
+    # Only the first resumed chunk is replaced.
+    assert len(connection.statements) == 1
+    assert connection.statements[0][1] == ([105, 106, 107, 108],)